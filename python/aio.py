@@ -0,0 +1,219 @@
+import asyncio
+from common import NativeError, RunTimeError, format_number
+from natives import NativeFunction, NativeObject, module, iterate, check_number, check_string, check_integer, lang_str
+from function import LangCallable
+from coroutine import LangCoroutine, Awaitable, Task, awaitable
+from lists import List
+from maps import Map
+from files import read_all, read_lines, write_file
+
+def check_awaitable(name, value):
+    if not isinstance(value, (LangCoroutine, Awaitable, Task)):
+        raise NativeError(f'{name}: argument must be a coroutine, task or async native')
+
+def running(name):
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        raise NativeError(f'{name}: can be used only while run is running')
+
+# Coroutines
+def run(value):
+    # Runs the event loop until the coroutine is finished, returns its result
+    check_awaitable('run', value)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(value.drive())
+    raise NativeError('run: cannot be used while run is running, use await')
+
+def spawn(value):
+    # Starts the coroutine, it runs concurrently with the one which spawned it
+    check_awaitable('spawn', value)
+    return Task(running('spawn').create_task(value.drive()))
+
+async def gather_all(values):
+    return List(list(await asyncio.gather(*[awaitable(value) for value in values])))
+
+def gather(values):
+    iterator = iterate(values)
+    if iterator is None:
+        raise NativeError('gather: argument must be a list of coroutines')
+    values = list(iterator)
+    for value in values:
+        check_awaitable('gather', value)
+    return Awaitable('gather', gather_all, values)
+
+async def sleep_all(seconds):
+    await asyncio.sleep(max(seconds, 0))
+    return None
+
+def sleep_async(seconds):
+    check_number('sleepAsync', seconds)
+    return Awaitable('sleepAsync', sleep_all, seconds)
+
+async def wait_for(value, seconds):
+    try:
+        return await asyncio.wait_for(awaitable(value), seconds)
+    except asyncio.TimeoutError:
+        raise NativeError(f'timeout: not finished in {format_number(seconds)} seconds')
+
+def timeout(value, seconds):
+    check_awaitable('timeout', value)
+    check_number('timeout', seconds)
+    return Awaitable('timeout', wait_for, value, seconds)
+
+# Sockets
+class Connection(NativeObject):
+    # TCP connection, reads and writes are awaited
+    def __init__(self, reader, writer):
+        super().__init__()
+        self.reader = reader
+        self.writer = writer
+
+    def __str__(self):
+        return '<connection>'
+
+    async def read_next_line(self):
+        line = await self.reader.readline()
+        if line == b'':
+            return None
+        return line.decode('utf-8', 'replace').rstrip('\r\n')
+
+    async def write_all(self, data):
+        self.writer.write(data.encode('utf-8'))
+        await self.writer.drain()
+        return None
+
+    def read_line(self, interpreter):
+        # Next line without newline, nil when the other side closed the connection
+        return Awaitable('readLine', self.read_next_line)
+
+    def write(self, interpreter, value):
+        return Awaitable('write', self.write_all, lang_str(value))
+
+    def write_line(self, interpreter, value):
+        return Awaitable('writeLine', self.write_all, lang_str(value) + '\n')
+
+    def close(self, interpreter):
+        self.writer.close()
+        return None
+
+    methods = {
+        'readLine': (0, read_line),
+        'write': (1, write),
+        'writeLine': (1, write_line),
+        'close': (0, close),
+    }
+
+async def open_connection(host, port):
+    reader, writer = await asyncio.open_connection(host, int(port))
+    return Connection(reader, writer)
+
+def connect(host, port):
+    check_string('connect', host)
+    check_integer('connect', port)
+    return Awaitable('connect', open_connection, host, port)
+
+class Server(NativeObject):
+    # TCP server started by listen, every connection is handled by its own coroutine
+    def __init__(self):
+        super().__init__()
+        self.server = None
+        # NOTE: first error of a handler, it is raised by close
+        self.error = None
+
+    def __str__(self):
+        return '<server>'
+
+    def port(self, interpreter):
+        return float(self.server.sockets[0].getsockname()[1])
+
+    def close(self, interpreter):
+        self.server.close()
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        return None
+
+    methods = {
+        'port': (0, port),
+        'close': (0, close),
+    }
+
+class Listen(NativeFunction):
+    # listen(host, port, handler): Server which calls handler(connection) for every connection,
+    # port 0 means any free port (see Server.port)
+    def __init__(self):
+        super().__init__('listen', 3, None, False)
+
+    def call(self, interpreter, arguments):
+        host, port, handler = arguments
+        check_string('listen', host)
+        check_integer('listen', port)
+        if not isinstance(handler, LangCallable) or handler.arity() != 1:
+            raise NativeError('listen: handler must be a function of 1 parameter')
+        return Awaitable('listen', self.start, interpreter, host, port, handler)
+
+    async def start(self, interpreter, host, port, handler):
+        server = Server()
+
+        async def on_connect(reader, writer):
+            connection = Connection(reader, writer)
+            try:
+                result = handler.call(interpreter, [connection])
+                if isinstance(result, (LangCoroutine, Awaitable, Task)):
+                    await result.drive()
+            except (RunTimeError, NativeError) as e:
+                if server.error is None:
+                    server.error = e
+            finally:
+                connection.close(interpreter)
+
+        server.server = await asyncio.start_server(on_connect, host, int(port))
+        return server
+
+# Processes and files
+async def run_shell(command):
+    process = await asyncio.create_subprocess_shell(command,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    output, errors = await process.communicate()
+    return Map({
+        'status': float(process.returncode),
+        'output': output.decode('utf-8', 'replace'),
+        'errors': errors.decode('utf-8', 'replace'),
+    })
+
+def run_process(command):
+    check_string('runProcess', command)
+    return Awaitable('runProcess', run_shell, command)
+
+async def in_thread(fn, *args):
+    # NOTE: files have no non-blocking API, blocking reads and writes run in a thread
+    return await asyncio.to_thread(fn, *args)
+
+def read_all_async(path):
+    check_string('readAllAsync', path)
+    return Awaitable('readAllAsync', in_thread, read_all, path)
+
+def read_lines_async(path):
+    check_string('readLinesAsync', path)
+    return Awaitable('readLinesAsync', in_thread, read_lines, path)
+
+def write_async(path, value):
+    check_string('writeAsync', path)
+    return Awaitable('writeAsync', in_thread, write_file, path, value)
+
+module('async', [
+    NativeFunction('run', 1, run, False),
+    NativeFunction('spawn', 1, spawn, False),
+    NativeFunction('gather', 1, gather, False),
+    NativeFunction('sleepAsync', 1, sleep_async, False),
+    NativeFunction('timeout', 2, timeout, False),
+    NativeFunction('connect', 2, connect, False),
+    Listen(),
+    NativeFunction('runProcess', 1, run_process, False),
+    NativeFunction('readAllAsync', 1, read_all_async, False),
+    NativeFunction('readLinesAsync', 1, read_lines_async, False),
+    NativeFunction('writeAsync', 2, write_async, False),
+])
@@ -18,7 +18,7 @@ class AstPrinter(Visitor):
         return f'(fun {stmt.name.lexeme} (' + \
           ' '.join([param.lexeme if param is stmt.function.params[0] else ' ' for param in stmt.function.params]) + \
           ') ' + \
-          ' '.join([body.accept(self) for body in stmt.function.body]) + \
+          ('lazy' if stmt.function.lazy is not None else ' '.join([body.accept(self) for body in stmt.function.body])) + \
           ')'
 
     def visit_if_stmt(self, stmt):
@@ -45,12 +45,26 @@ class AstPrinter(Visitor):
     def visit_while_stmt(self, stmt):
         return self.parenthesize2('while', stmt.condition, stmt.body)
 
+    def visit_for_in_stmt(self, stmt):
+        return self.parenthesize2('for-in', stmt.name.lexeme, stmt.iterable, stmt.body)
+
+    def visit_import_stmt(self, stmt):
+        return f'(import "{stmt.path}" {stmt.name.lexeme})'
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is None:
+            return '(yield)'
+        return self.parenthesize('yield', stmt.value)
+
     def visit_block_stmt(self, stmt):
       return '(block' + ' '.join([s.accept(self) if s is not None else '' for s in stmt.stmts]) + ')'
 
     def visit_break_stmt(self, stmt):
         return '(break)'
 
+    def visit_counted_loop_stmt(self, stmt):
+        return self.parenthesize2('counted-loop', stmt.condition, stmt.body, stmt.increment)
+
     # Expressions
     def visit_super_expr(self, expr):
         return self.parenthesize2('super', expr.method)
@@ -92,6 +106,18 @@ class AstPrinter(Visitor):
 
     def visit_unary_expr(self, expr):
         return self.parenthesize(expr.operator.lexeme, expr.right)
+
+    def visit_compare_locals_expr(self, expr):
+        return self.parenthesize(expr.operator.lexeme, expr.left, expr.right)
+
+    def visit_increment_expr(self, expr):
+        return self.parenthesize2('+=', expr.name.lexeme, expr.step)
+
+    def visit_invariant_expr(self, expr):
+        return self.parenthesize('invariant', expr.expression)
+
+    def visit_await_expr(self, expr):
+        return self.parenthesize('await', expr.value)
     
     def printExpr(self, expr):
       return expr.accept(self)
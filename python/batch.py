@@ -0,0 +1,79 @@
+import io
+import os
+import time
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+# NOTE: number of worker processes of `--batch`
+WORKERS = int(os.getenv('WORKERS') or os.cpu_count() or 1)
+
+# NOTE: Lang class, set before workers are forked, see run_batch
+LANG = None
+
+def read_manifest(path):
+    # Script paths, one per line, relative to the manifest, `#` starts a comment
+    base = os.path.dirname(path)
+    with open(path, 'r') as f:
+        lines = [line.split('#')[0].strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line != '']
+
+def script_paths(args):
+    paths = []
+    for arg in args:
+        if arg.startswith('@'):
+            paths.extend(read_manifest(arg[1:]))
+        else:
+            paths.append(arg)
+    return paths
+
+def run_script(path):
+    # Runs script in a new Lang (interpreter), returns (path, exit status, output, seconds)
+    output = io.StringIO()
+    status = 0
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        try:
+            LANG().run_file(path)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            # NOTE: crash of one script does not stop the batch
+            traceback.print_exc(file=output)
+            status = 1
+    return path, status, output.getvalue(), time.perf_counter() - start
+
+def run_batch(lang, args, workers=WORKERS):
+    # Runs scripts in worker processes forked after all modules are imported,
+    # prints output of every script and a summary, returns exit status of the batch
+    global LANG
+    LANG = lang
+    try:
+        paths = script_paths(args)
+    except OSError as e:
+        print(f'ERROR: cannot read manifest: {e}')
+        return 68
+    start = time.perf_counter()
+    workers = max(min(workers, len(paths)), 1)
+    if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        results = [run_script(path) for path in paths]
+    else:
+        context = multiprocessing.get_context('fork')
+        # NOTE: scripts are sent in chunks, many small scripts are the common case
+        chunk = max(len(paths) // (workers * 8), 1)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            results = list(executor.map(run_script, paths, chunksize=chunk))
+    total = time.perf_counter() - start
+    for path, status, output, seconds in results:
+        print(f'==> {path} <==')
+        print(output, end='')
+    print('==> summary <==')
+    failed = 0
+    for path, status, output, seconds in results:
+        if status != 0:
+            failed += 1
+        result = 'PASSED' if status == 0 else 'FAILED'
+        print(f'{result} {path} (exit {status}, {seconds * 1000:.1f} ms)')
+    print(f'{len(results) - failed} passed, {failed} failed, {len(results)} scripts in {total:.2f} s ({workers} workers)')
+    return 0 if failed == 0 else 1
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+
+import sys
+import os
+import subprocess
+import time
+
+# NOTE: each configuration turns passes on/off through env variables read by lang.py
+CONFIGURATIONS = [
+    ('baseline', {'INFERTYPES': '0', 'FUSE': '0', 'INLINE': '0', 'LOOPOPT': '0'}),
+    ('types', {'INFERTYPES': '1', 'FUSE': '0', 'INLINE': '0', 'LOOPOPT': '0'}),
+    ('fuse', {'INFERTYPES': '0', 'FUSE': '1', 'INLINE': '0', 'LOOPOPT': '0'}),
+    ('inline', {'INFERTYPES': '0', 'FUSE': '0', 'INLINE': '1', 'LOOPOPT': '0'}),
+    ('loopopt', {'INFERTYPES': '0', 'FUSE': '0', 'INLINE': '0', 'LOOPOPT': '1'}),
+    ('all', {'INFERTYPES': '1', 'FUSE': '1', 'INLINE': '1', 'LOOPOPT': '1'}),
+]
+REPEAT = int(os.getenv('REPEAT') or 3)
+
+def run(source_file, env):
+    lang = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lang.py')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, lang, source_file], env={**os.environ, **env},
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def benchmark(source_file):
+    print(source_file)
+    baseline = None
+    for name, env in CONFIGURATIONS:
+        best = min([run(source_file, env) for _ in range(REPEAT)])
+        if baseline is None:
+            baseline = best
+        print(f'  {name:<12} {best:8.3f}s  {baseline / best:5.2f}x')
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("ERROR: USAGE 'benchmark.py <source file>...'")
+        exit(69)
+    for source_file in sys.argv[1:]:
+        benchmark(source_file)
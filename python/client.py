@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# Thin client of `lang.py --serve`, it imports only the standard library,
+# so it starts much faster than lang.py
+
+import os
+import sys
+import json
+import socket
+import struct
+
+# NOTE: time limit in seconds sent with the request, 0 means the limit of the server
+TIMEOUT = float(os.getenv('TIMEOUT') or 0)
+
+# Frames sent by the server: kind, then length of the data which follows (OUTPUT)
+# or the exit status of the script (EXIT)
+HEADER = struct.Struct('!cI')
+OUTPUT = b'o'
+EXIT = b'x'
+
+def send_frame(conn, kind, value, data=b''):
+    conn.sendall(HEADER.pack(kind, value) + data)
+
+def read_exact(conn, size):
+    # NOTE: None when the connection is closed before all the bytes came
+    chunks = []
+    while size > 0:
+        chunk = conn.recv(min(size, 1 << 16))
+        if chunk == b'':
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def request(socket_path, source_file):
+    # Runs script by the server, prints its output, returns its exit status
+    message = {'cwd': os.getcwd(), 'timeout': TIMEOUT}
+    if source_file == '-':
+        message['source'] = sys.stdin.read()
+    else:
+        message['path'] = os.path.abspath(source_file)
+        # NOTE: modules imported by the script are relative to its file
+        message['directory'] = os.path.dirname(message['path'])
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except OSError as e:
+        print(f'ERROR: cannot connect to {socket_path}: {e.strerror}')
+        return 68
+    with conn:
+        conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        out = sys.stdout.buffer
+        while True:
+            header = read_exact(conn, HEADER.size)
+            if header is None:
+                break
+            kind, value = HEADER.unpack(header)
+            if kind == EXIT:
+                out.flush()
+                return value
+            data = read_exact(conn, value)
+            if data is None:
+                break
+            out.write(data)
+    out.flush()
+    print('ERROR: server closed the connection')
+    return 70
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("ERROR: USAGE 'client.py <socket> <source file or ->'")
+        exit(69)
+    exit(request(sys.argv[1], sys.argv[2]))
@@ -1,10 +1,33 @@
 from tokens import TokenKind
 
+def format_number(value):
+    # NOTE: numbers are floats, integral ones are printed without `.0`,
+    # from 1e16 up str() uses exponent and -0 keeps its sign, so they take the slow path
+    if value.is_integer() and -1e16 < value < 1e16 and value != 0:
+        return str(int(value))
+    t = str(value)
+    if t.endswith('.0'):
+        return t[:-2]
+    return t
+
+def stringify(obj):
+    if obj is None:
+        return 'nil'
+    if isinstance(obj, float):
+        return format_number(obj)
+    if isinstance(obj, str):
+        return f'"{obj}"'
+    return str(obj)
+
 class RunTimeError(Exception):
     def __init__(self, token, message):
         super().__init__(message)
         self.token = token
 
+class NativeError(Exception):
+    # NOTE: raised by native functions, interpreter reports it as RunTimeError of the call
+    pass
+
 class Return(Exception):
     def __init__(self, value):
         self.value = value
@@ -14,8 +37,10 @@ class BreakException(RunTimeError):
         super().__init__(token, message)
 
 class ErrorHandler:
-    def __init__(self, lang):
+    def __init__(self, lang, out=None):
         self.lang = lang
+        # NOTE: file written by errors and warnings, None means sys.stdout
+        self.out = out
 
     def error(self, line_number, message):
         self.report(line_number, '', message)
@@ -27,24 +52,24 @@ class ErrorHandler:
             self.report(token.line, f'at "{token.lexeme}"', message)
     
     def warningT(self, token, message):
-        print(f'[WARNING: {token.line}] `{token.lexeme}` {message}')
+        print(f'[WARNING: {token.line}] `{token.lexeme}` {message}', file=self.out)
 
     def report(self, line, where, message):
         self.lang.had_error = True
         # TODO: come up with better error handling
         if line == 0 and where == '':
-            print(f'ERROR: {message}')
+            print(f'ERROR: {message}', file=self.out)
         else:
-            print(f'[Line {line}] ERROR: {where} {message}')
+            print(f'[Line {line}] ERROR: {where} {message}', file=self.out)
         
     def runtime_error(self, ex):
         self.lang.had_runtime_error = True
-        print(f'[Line {ex.token.line}] {ex}')
+        print(f'[Line {ex.token.line}] {ex}', file=self.out)
 
 class Environment:
-    def __init__(self, enclosing = None):
+    def __init__(self, enclosing = None, values = None):
         self.enclosing = enclosing
-        self.values = {}
+        self.values = {} if values is None else values
     
     def define(self, name, value):
         self.values[name] = value
@@ -59,6 +84,10 @@ class Environment:
     def get_at(self, distance, name):
         return self.ancestor(distance).values[name]
 
+    def get_value(self, name):
+        # Value of the name in this environment, None when it is not defined
+        return self.values.get(name)
+
     def assign(self, token, value):
         if token.lexeme in self.values:
             self.values[token.lexeme] = value
@@ -77,6 +106,49 @@ class Environment:
             env = env.enclosing
         return env
 
+class GlobalEnvironment(Environment):
+    # Globals of one interpreter layered over a shared base, e.g. natives or globals of
+    # a library run once: names missing in own values are looked up in the base, define
+    # and assign change only own values (copy-on-write), so many interpreters share
+    # the base without copying or changing it. Values themselves are not copied,
+    # e.g. a list of the base is the same list in all interpreters.
+    # NOTE: directory imports of code running over these globals are relative to,
+    # set for globals of modules (see modules.py), the program uses Interpreter.directory
+    directory = None
+
+    def __init__(self, base=None):
+        super().__init__()
+        self.base = base
+
+    def find(self, name):
+        # Environment of the layer with the name, None when it is not defined
+        env = self
+        while env is not None:
+            if name in env.values:
+                return env
+            env = env.base
+        return None
+
+    def get(self, token):
+        # NOTE: find inlined, globals (e.g. natives) are read often
+        name = token.lexeme
+        env = self
+        while env is not None:
+            if name in env.values:
+                return env.values[name]
+            env = env.base
+        raise RunTimeError(token, f'Undefined variable {name}')
+
+    def get_value(self, name):
+        # Value of the name, None when it is not defined
+        env = self.find(name)
+        return None if env is None else env.values[name]
+
+    def assign(self, token, value):
+        if self.find(token.lexeme) is None:
+            raise RunTimeError(token, f'Undefined variable "{token.lexeme}"')
+        self.values[token.lexeme] = value
+
 
 class Visitor:
     # Statements
@@ -104,12 +176,24 @@ class Visitor:
     def visit_while_stmt(self, stmt):
         raise NotImplementedError()
 
+    def visit_for_in_stmt(self, stmt):
+        raise NotImplementedError()
+
+    def visit_yield_stmt(self, stmt):
+        raise NotImplementedError()
+
+    def visit_import_stmt(self, stmt):
+        raise NotImplementedError()
+
     def visit_block_stmt(self, stmt):
         raise NotImplementedError()
 
     def visit_break_stmt(self, stmt):
         raise NotImplementedError()
 
+    def visit_counted_loop_stmt(self, stmt):
+        raise NotImplementedError()
+
     # Expressions
     def visit_super_expr(self, expr):
         raise NotImplementedError()
@@ -149,3 +233,139 @@ class Visitor:
 
     def visit_unary_expr(self, expr):
         raise NotImplementedError()
+
+    def visit_compare_locals_expr(self, expr):
+        raise NotImplementedError()
+
+    def visit_increment_expr(self, expr):
+        raise NotImplementedError()
+
+    def visit_invariant_expr(self, expr):
+        raise NotImplementedError()
+
+    def visit_await_expr(self, expr):
+        raise NotImplementedError()
+
+
+class Walker(Visitor):
+    # Visits every node of the AST and does nothing,
+    # passes which only look for some nodes override the visits they need
+    def walk(self, stmts):
+        for stmt in stmts:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def walk_expr(self, expr):
+        expr.accept(self)
+
+    # Statements
+    def visit_class_stmt(self, stmt):
+        if stmt.super_class is not None:
+            self.walk_expr(stmt.super_class)
+        for method in stmt.methods:
+            self.walk_expr(method.function)
+
+    def visit_function_stmt(self, stmt):
+        self.walk_expr(stmt.function)
+
+    def visit_if_stmt(self, stmt):
+        self.walk_expr(stmt.condition)
+        self.walk([stmt.then_branch, stmt.else_branch])
+
+    def visit_var_stmt(self, stmt):
+        if stmt.initializer is not None:
+            self.walk_expr(stmt.initializer)
+
+    def visit_expression_stmt(self, stmt):
+        self.walk_expr(stmt.expr)
+
+    def visit_print_stmt(self, stmt):
+        self.walk_expr(stmt.expr)
+
+    def visit_return_stmt(self, stmt):
+        if stmt.value is not None:
+            self.walk_expr(stmt.value)
+
+    def visit_while_stmt(self, stmt):
+        self.walk_expr(stmt.condition)
+        self.walk([stmt.body])
+
+    def visit_for_in_stmt(self, stmt):
+        self.walk_expr(stmt.iterable)
+        self.walk([stmt.body])
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is not None:
+            self.walk_expr(stmt.value)
+
+    def visit_import_stmt(self, stmt):
+        pass
+
+    def visit_block_stmt(self, stmt):
+        self.walk(stmt.stmts)
+
+    def visit_break_stmt(self, stmt):
+        pass
+
+    def visit_counted_loop_stmt(self, stmt):
+        self.walk_expr(stmt.condition)
+        self.walk([stmt.body])
+        self.walk_expr(stmt.increment)
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        pass
+
+    def visit_this_expr(self, expr):
+        pass
+
+    def visit_get_expr(self, expr):
+        self.walk_expr(expr.object)
+
+    def visit_set_expr(self, expr):
+        self.walk_expr(expr.object)
+        self.walk_expr(expr.value)
+
+    def visit_function_expr(self, expr):
+        self.walk(expr.body)
+
+    def visit_logical_expr(self, expr):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_call_expr(self, expr):
+        self.walk_expr(expr.callee)
+        for arg in expr.arguments:
+            self.walk_expr(arg)
+
+    def visit_variable_expr(self, expr):
+        pass
+
+    def visit_assign_expr(self, expr):
+        self.walk_expr(expr.value)
+
+    def visit_binary_expr(self, expr):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_grouping_expr(self, expr):
+        self.walk_expr(expr.expression)
+
+    def visit_literal_expr(self, expr):
+        pass
+
+    def visit_unary_expr(self, expr):
+        self.walk_expr(expr.right)
+
+    def visit_compare_locals_expr(self, expr):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_increment_expr(self, expr):
+        pass
+
+    def visit_invariant_expr(self, expr):
+        self.walk_expr(expr.expression)
+
+    def visit_await_expr(self, expr):
+        self.walk_expr(expr.value)
@@ -0,0 +1,102 @@
+import asyncio
+from common import Return, NativeError
+from natives import NativeObject
+
+class LangCoroutine(NativeObject):
+    # Result of calling async function. Its body is run (by GeneratorExecutor) when it is
+    # awaited, run or spawned, at every `await` it gives the awaited value to drive,
+    # which awaits it on the asyncio event loop, so other coroutines can run meanwhile.
+    def __init__(self, interpreter, frame):
+        super().__init__()
+        self.interpreter = interpreter
+        self.frame = frame
+        # NOTE: globals of the module which created the coroutine, see modules.py
+        self.globals = interpreter.globals
+
+    def __str__(self):
+        return '<coroutine>'
+
+    async def drive(self):
+        if self.frame is None:
+            raise NativeError('coroutine can be awaited only once')
+        frame, self.frame = self.frame, None
+        interpreter = self.interpreter
+        result, error = None, None
+        while True:
+            previous, previous_globals = interpreter.env, interpreter.globals
+            interpreter.globals = self.globals
+            try:
+                if error is None:
+                    value = frame.send(result)
+                else:
+                    value = frame.throw(error)
+            except StopIteration:
+                return None
+            except Return as r:
+                return r.value
+            finally:
+                interpreter.env, interpreter.globals = previous, previous_globals
+            result, error = None, None
+            try:
+                result = await awaitable(value)
+            except NativeError as e:
+                # NOTE: error is raised in the body, at the line of its `await`
+                error = e
+            except (OSError, EOFError) as e:
+                error = NativeError(str(e) or type(e).__name__)
+
+class Awaitable(NativeObject):
+    # Operation of async native, e.g. sleepAsync(1). Python coroutine is created when it
+    # is awaited, so an operation which is never awaited leaves nothing behind.
+    def __init__(self, name, fn, *args):
+        super().__init__()
+        self.name = name
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return f'<awaitable {self.name}>'
+
+    async def drive(self):
+        if self.fn is None:
+            raise NativeError(f'{self.name}: operation can be awaited only once')
+        fn, self.fn = self.fn, None
+        try:
+            return await fn(*self.args)
+        except (OSError, EOFError, ValueError) as e:
+            raise NativeError(f'{self.name}: {str(e) or type(e).__name__}')
+
+class Task(NativeObject):
+    # Coroutine running on the event loop (see spawn), awaiting it gives its result
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+
+    def __str__(self):
+        return '<task>'
+
+    async def drive(self):
+        # NOTE: shielded, cancelled awaiting coroutine does not cancel the task
+        try:
+            return await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if not self.task.cancelled():
+                raise
+        raise NativeError('task was cancelled')
+
+    def done(self, interpreter):
+        return self.task.done()
+
+    def cancel(self, interpreter):
+        return self.task.cancel()
+
+    methods = {
+        'done': (0, done),
+        'cancel': (0, cancel),
+    }
+
+def awaitable(value):
+    # Python awaitable for Lang value
+    if isinstance(value, (LangCoroutine, Awaitable, Task)):
+        return value.drive()
+    raise NativeError('Can only await coroutines, tasks and async natives')
@@ -1,4 +1,9 @@
 class Expr:
+    # NOTE: distance to the environment of the variable (VariableExpr, AssignExpr, ThisExpr,
+    # SuperExpr), set by Resolver, None means global. It is kept on the node, so compiled
+    # program does not depend on the Interpreter which runs it.
+    depth = None
+
     def __hash__(self):
         return hash(str(self))
     
@@ -47,10 +52,32 @@ class FunctionExpr(Expr):
     def __init__(self, params, body):
         self.params = params
         self.body = body
+        # NOTE: set by Resolver, levels of enclosing environments (counted from
+        # the environment in which function is created) used by the function body
+        self.captures = None
+        # NOTE: set by Resolver, function containing `yield` returns a generator
+        self.is_generator = False
+        # NOTE: set by Parser, `async fun` returns a coroutine
+        self.is_async = False
+        # NOTE: set by Parser, LazyBody of function whose body is not parsed yet (body is empty)
+        self.lazy = None
 
     def accept(self, visitor):
         return visitor.visit_function_expr(self)
 
+class LazyBody:
+    # Tokens of a function body which is parsed (resolved and optimized) when the function
+    # is called the first time, see Parser and lazy.py. Only top-level functions and
+    # methods of top-level classes are lazy, so the scopes around the body are known.
+    def __init__(self, tokens, name, class_name, has_super, passes):
+        self.tokens = tokens
+        self.name = name
+        # NOTE: class name token of a method, None for a function
+        self.class_name = class_name
+        self.has_super = has_super
+        # NOTE: (INFER_TYPES, LOOP_OPT, FUSE) of the program, see lang.py
+        self.passes = passes
+
 class CallExpr(Expr):
     def __init__(self, callee, token, arguments):
         self.callee = callee
@@ -82,6 +109,8 @@ class BinaryExpr(Expr):
         self.left = left
         self.operator = operator
         self.right = right
+        # NOTE: set by TypeInferrer when both operands are proven numbers
+        self.numeric = False
 
     def accept(self, visitor):
         return visitor.visit_binary_expr(self)
@@ -104,6 +133,7 @@ class UnaryExpr(Expr):
     def __init__(self, operator, right):
         self.operator = operator
         self.right = right
+        self.numeric = False
 
     def accept(self, visitor):
         return visitor.visit_unary_expr(self)
@@ -114,3 +144,49 @@ class VariableExpr(Expr):
 
     def accept(self, visitor):
         return visitor.visit_variable_expr(self)
+
+# Fused expressions, produced by Fuser from resolved AST.
+# Operands are VariableExpr with their resolved distance (None for globals)
+# or LiteralExpr, so they are read without dispatching through `accept`.
+class CompareLocalsExpr(Expr):
+    def __init__(self, left, operator, right, left_distance, right_distance, numeric):
+        self.left = left
+        self.operator = operator
+        self.right = right
+        self.left_distance = left_distance
+        self.right_distance = right_distance
+        self.numeric = numeric
+
+    def accept(self, visitor):
+        return visitor.visit_compare_locals_expr(self)
+
+class IncrementExpr(Expr):
+    # `name = name + step`, where name is a local variable
+    def __init__(self, name, distance, operator, step, numeric):
+        self.name = name
+        self.distance = distance
+        self.operator = operator
+        self.step = step
+        self.numeric = numeric
+
+    def accept(self, visitor):
+        return visitor.visit_increment_expr(self)
+
+class InvariantExpr(Expr):
+    # Loop invariant expression, produced by LoopOptimizer.
+    # It is evaluated once per loop execution (when it is first reached)
+    # and the value is reused by the following iterations.
+    def __init__(self, expression):
+        self.expression = expression
+
+    def accept(self, visitor):
+        return visitor.visit_invariant_expr(self)
+
+class AwaitExpr(Expr):
+    # `await value`, allowed only as the whole value of a statement, see Resolver.await_position
+    def __init__(self, keyword, value):
+        self.keyword = keyword
+        self.value = value
+
+    def accept(self, visitor):
+        return visitor.visit_await_expr(self)
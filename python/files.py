@@ -0,0 +1,190 @@
+import os
+import mmap
+from common import NativeError
+from natives import NativeFunction, NativeObject, module, check_string, lang_str, CLEANUPS
+from lists import List
+
+# NOTE: size of reads, of batches of lines and of batched writes
+FILE_BUFFER = int(os.getenv('FILEBUFFER') or 1 << 20)
+# NOTE: files at least this big are read whole through mmap, it saves a copy
+MMAP_SIZE = int(os.getenv('MMAPSIZE') or 1 << 24)
+
+# Files which are not closed yet, closed by close_files when the program ends
+OPEN_FILES = set()
+
+def strip_newline(line):
+    return line[:-1] if line.endswith('\n') else line
+
+def read_file(name, path):
+    check_string(name, path)
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MMAP_SIZE:
+                text = str(f.read(), 'utf-8', 'replace')
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    text = str(m, 'utf-8', 'replace')
+    except OSError as e:
+        raise NativeError(f'{name}: {e.strerror}: {path}')
+    # NOTE: newlines are translated like in text mode
+    return text.replace('\r\n', '\n')
+
+class File(NativeObject):
+    # Open file, read line by line (lazily in for-in) or written in batches.
+    # File is closed by close, when a loop over its lines ends, or when the program ends.
+    def __init__(self, path, mode):
+        super().__init__()
+        self.path = path
+        self.mode = mode
+        # NOTE: invalid UTF-8 is replaced, one bad byte should not stop a scan of a log
+        self.file = open(path, mode, buffering=FILE_BUFFER, encoding='utf-8', errors='replace')
+        # NOTE: pending writes, they are joined and written when there is FILE_BUFFER of them
+        self.parts = []
+        self.size = 0
+        OPEN_FILES.add(self)
+
+    def __str__(self):
+        return f'<file {self.path}>'
+
+    def check(self, name, mode):
+        if self.file is None:
+            raise NativeError(f'{name}: file {self.path} is closed')
+        if (mode == 'r') != (self.mode == 'r'):
+            raise NativeError(f'{name}: file {self.path} is not open for ' + ('reading' if mode == 'r' else 'writing'))
+
+    def iterate(self):
+        self.check('for-in', 'r')
+        return self.lines()
+
+    def lines(self):
+        # NOTE: lines are read in batches of FILE_BUFFER bytes,
+        # only one batch is in memory at a time
+        f = self.file
+        try:
+            while True:
+                batch = f.readlines(FILE_BUFFER)
+                if len(batch) == 0:
+                    break
+                for line in batch:
+                    yield strip_newline(line)
+                if self.file is not f:
+                    # NOTE: closed by the loop body
+                    return
+        finally:
+            # NOTE: also when the loop ends early (break, return or error),
+            # for-in closes its iterator, see Interpreter.visit_for_in_stmt
+            if self.file is f:
+                self.close(None)
+
+    def read_line(self, interpreter):
+        # Next line without newline, nil at the end of the file
+        self.check('readLine', 'r')
+        line = self.file.readline()
+        if line == '':
+            return None
+        return strip_newline(line)
+
+    def read_all(self, interpreter):
+        # Rest of the file
+        self.check('readAll', 'r')
+        return self.file.read()
+
+    def write(self, interpreter, value):
+        self.check('write', 'w')
+        value = lang_str(value)
+        self.parts.append(value)
+        self.size += len(value)
+        if self.size >= FILE_BUFFER:
+            self.flush(interpreter)
+        return None
+
+    def write_line(self, interpreter, value):
+        self.write(interpreter, value)
+        return self.write(interpreter, '\n')
+
+    def flush(self, interpreter):
+        self.check('flush', 'w')
+        try:
+            self.file.write(''.join(self.parts))
+            self.file.flush()
+        except OSError as e:
+            raise NativeError(f'flush: {e.strerror}: {self.path}')
+        self.parts = []
+        self.size = 0
+        return None
+
+    def close(self, interpreter):
+        # NOTE: closing closed file does nothing
+        if self.file is None:
+            return None
+        try:
+            if len(self.parts) > 0:
+                self.file.write(''.join(self.parts))
+            self.file.close()
+        except OSError as e:
+            raise NativeError(f'close: {e.strerror}: {self.path}')
+        finally:
+            self.file = None
+            self.parts = []
+            OPEN_FILES.discard(self)
+        return None
+
+    def is_open(self, interpreter):
+        return self.file is not None
+
+    methods = {
+        'readLine': (0, read_line),
+        'readAll': (0, read_all),
+        'write': (1, write),
+        'writeLine': (1, write_line),
+        'flush': (0, flush),
+        'close': (0, close),
+        'isOpen': (0, is_open),
+    }
+
+def open_file(path, mode):
+    check_string('open', path, mode)
+    if mode not in ['r', 'w', 'a']:
+        raise NativeError('open: mode must be "r", "w" or "a"')
+    try:
+        return File(path, mode)
+    except OSError as e:
+        raise NativeError(f'open: {e.strerror}: {path}')
+
+def read_all(path):
+    return read_file('readAll', path)
+
+def read_lines(path):
+    text = read_file('readLines', path)
+    lines = text.split('\n')
+    if lines[-1] == '':
+        # NOTE: newline at the end of the last line does not start a new line
+        lines.pop()
+    return List(lines)
+
+def write_file(path, value):
+    # Writes value to the file, replaces its content
+    check_string('write', path)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(lang_str(value))
+    except OSError as e:
+        raise NativeError(f'write: {e.strerror}: {path}')
+    return None
+
+def close_files():
+    for f in list(OPEN_FILES):
+        try:
+            f.close(None)
+        except NativeError:
+            # DO NOTHING
+            pass
+
+CLEANUPS.append(close_files)
+
+module('io', [
+    NativeFunction('open', 2, open_file, False),
+    NativeFunction('readAll', 1, read_all, False),
+    NativeFunction('readLines', 1, read_lines, False),
+    NativeFunction('write', 2, write_file, False),
+])
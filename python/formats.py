@@ -0,0 +1,124 @@
+import re
+import csv
+import json
+from common import NativeError, format_number
+from natives import NativeFunction, NativeObject, module, check_string, lang_str
+from lists import List, FloatArray
+from maps import Map
+from files import FILE_BUFFER
+
+# NOTE: CSV fields like these are numbers, anything else (e.g. "007", "1e5x", "nan") is a string
+CSV_NUMBER = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?')
+
+# JSON
+def lang_value(value):
+    # Python value from json.loads to Lang value, objects are already Maps (see map_pairs)
+    if isinstance(value, list):
+        return List([lang_value(item) for item in value])
+    return value
+
+def map_pairs(pairs):
+    return Map({key: lang_value(value) for key, value in pairs})
+
+def parse_json(s):
+    check_string('parseJSON', s)
+    try:
+        # NOTE: all numbers are floats in Lang
+        return lang_value(json.loads(s, parse_int=float, object_pairs_hook=map_pairs))
+    except json.JSONDecodeError as e:
+        raise NativeError(f'parseJSON: {e.msg} at line {e.lineno} column {e.colno}')
+
+def json_value(value):
+    # Lang value to Python value for json.dumps
+    if isinstance(value, float):
+        # NOTE: integers are written without fraction, like Lang prints them
+        if value.is_integer() and -1e16 < value < 1e16:
+            return int(value)
+        return value
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, (List, FloatArray)):
+        return [json_value(item) for item in value.iterate()]
+    if isinstance(value, Map):
+        return {json_key(key): json_value(item) for key, item in value.entries.items()}
+    raise NativeError(f'toJSON: {lang_str(value)} cannot be converted to JSON')
+
+def json_key(key):
+    if isinstance(key, float):
+        return format_number(key)
+    return key
+
+def to_json(value):
+    try:
+        return json.dumps(json_value(value), allow_nan=False, ensure_ascii=False)
+    except ValueError:
+        raise NativeError('toJSON: NaN and infinity cannot be converted to JSON')
+
+# CSV
+def csv_field(field):
+    if CSV_NUMBER.fullmatch(field):
+        return float(field)
+    return field
+
+class CsvReader(NativeObject):
+    # Rows of CSV file for for-in, read lazily: Lists of fields,
+    # or Maps from the names in the first row when the file has a header.
+    # Every loop over the reader reads the file again.
+    def __init__(self, path, header):
+        super().__init__()
+        self.path = path
+        self.header = header
+
+    def __str__(self):
+        return f'<csv {self.path}>'
+
+    def iterate(self):
+        try:
+            f = open(self.path, newline='', buffering=FILE_BUFFER, encoding='utf-8', errors='replace')
+        except OSError as e:
+            raise NativeError(f'readCSV: {e.strerror}: {self.path}')
+        return self.rows(f)
+
+    def rows(self, f):
+        # NOTE: file is closed when the rows are read or when the loop drops the iterator, e.g. on break
+        with f:
+            reader = csv.reader(f)
+            if not self.header:
+                for row in reader:
+                    yield List([csv_field(field) for field in row])
+                return
+            names = next(reader, None)
+            if names is None:
+                return
+            for row in reader:
+                yield Map(dict(zip(names, [csv_field(field) for field in row])))
+
+def read_csv(path, header):
+    check_string('readCSV', path)
+    if not isinstance(header, bool):
+        raise NativeError('readCSV: header must be true or false')
+    return CsvReader(path, header)
+
+def to_csv(row):
+    # One CSV line (without newline) from the values of List
+    if not isinstance(row, (List, FloatArray)):
+        raise NativeError('toCSV: argument must be a list')
+    line = CsvLine()
+    csv.writer(line, lineterminator='').writerow([lang_str(value) for value in row.iterate()])
+    return line.value
+
+class CsvLine:
+    # NOTE: csv.writer needs an object with write
+    def __init__(self):
+        self.value = ''
+
+    def write(self, value):
+        self.value += value
+
+module('formats', [
+    # NOTE: parseJSON is not pure, every call returns new lists and maps
+    NativeFunction('parseJSON', 1, parse_json, False),
+    NativeFunction('toJSON', 1, to_json),
+    NativeFunction('readCSV', 2, read_csv, False),
+    NativeFunction('toCSV', 1, to_csv),
+])
@@ -7,23 +7,16 @@ class LangCallable:
     def arity(self):
         pass
 
-class Clock(LangCallable):
-    def __str__(self):
-        return '<native function>'
-
-    def call(self, interpreter, arguments):
-        import time
-        return time.time()
-
-    def arity(self):
-        return 0
-
 class LangFunction(LangCallable):
-    def __init__(self, name, declaration, closure, is_initializer):
+    def __init__(self, name, declaration, closure, is_initializer, globals=None):
         self.name = name
         self.declaration = declaration
         self.closure = closure
         self.is_initializer = is_initializer
+        # NOTE: globals of the imported module which declared the function (see modules.py),
+        # None for functions of the program, they use the program globals of the running
+        # interpreter, so a function can run over the globals of many interpreters (see base)
+        self.globals = globals
     
     def __str__(self):
         if self.name is None:
@@ -31,9 +24,30 @@ class LangFunction(LangCallable):
         return f'<fn {self.name}>'
 
     def call(self, interpreter, arguments):
+        globals = interpreter.main_globals if self.globals is None else self.globals
+        if globals is not interpreter.globals:
+            # NOTE: e.g. module calls a callback of the program
+            previous = interpreter.globals
+            interpreter.globals = globals
+            try:
+                return self.call_body(interpreter, arguments)
+            finally:
+                interpreter.globals = previous
+        return self.call_body(interpreter, arguments)
+
+    def call_body(self, interpreter, arguments):
+        if self.declaration.lazy is not None:
+            # NOTE: body is parsed when the function is called the first time
+            interpreter.compile_lazy(self.declaration)
         env = Environment(self.closure)
         for i in range(len(self.declaration.params)):
             env.define(self.declaration.params[i].lexeme, arguments[i])
+        if self.declaration.is_generator:
+            # NOTE: body runs later, when values of the generator are asked for
+            return interpreter.generator(self.declaration.body, env)
+        if self.declaration.is_async:
+            # NOTE: body runs when the coroutine is awaited (or run, or spawned)
+            return interpreter.coroutine(self.declaration.body, env)
         try:
             interpreter.execute_block(self.declaration.body, env)
         except Return as r:
@@ -50,4 +64,4 @@ class LangFunction(LangCallable):
     def bind(self, instance):
         env = Environment(self.closure)
         env.define('this', instance)
-        return LangFunction(self.name, self.declaration, env, self.is_initializer)
\ No newline at end of file
+        return LangFunction(self.name, self.declaration, env, self.is_initializer, self.globals)
\ No newline at end of file
@@ -0,0 +1,200 @@
+from common import Visitor
+from tokens import TokenKind
+from expr import *
+from stmt import *
+
+COMPARISON_OPERATORS = [
+    TokenKind.GREATER, TokenKind.GREATER_EQUAL,
+    TokenKind.LESS, TokenKind.LESS_EQUAL,
+    TokenKind.EQUAL_EQUAL, TokenKind.BANG_EQUAL
+]
+
+class Fuser(Visitor):
+    # Replaces common loop idioms with fused nodes which do the whole
+    # operation in one step, instead of several `accept` dispatches:
+    #   i < n, i < 10         -> CompareLocalsExpr
+    #   i = i + 1, i = i - 2  -> IncrementExpr
+    #   while (i < n) { ...; i = i + 1; } -> CountedLoopStmt
+    # NOTE: must run after Resolver (it needs resolved distances),
+    # after TypeInferrer (fused nodes keep the `numeric` proofs)
+    # and after LoopOptimizer (counted loops keep the loop invariants).
+    def __init__(self):
+        self.fused = 0
+
+    def fuse(self, stmts):
+        for i in range(len(stmts)):
+            stmts[i] = self.fuse_stmt(stmts[i])
+        return stmts
+
+    def fuse_stmt(self, stmt):
+        if stmt is None:
+            return None
+        return stmt.accept(self)
+
+    def fuse_expr(self, expr):
+        return expr.accept(self)
+
+    def visit_class_stmt(self, stmt):
+        for method in stmt.methods:
+            self.fuse_expr(method.function)
+        return stmt
+
+    def visit_function_stmt(self, stmt):
+        self.fuse_expr(stmt.function)
+        return stmt
+
+    def visit_if_stmt(self, stmt):
+        stmt.condition = self.fuse_expr(stmt.condition)
+        stmt.then_branch = self.fuse_stmt(stmt.then_branch)
+        stmt.else_branch = self.fuse_stmt(stmt.else_branch)
+        return stmt
+
+    def visit_var_stmt(self, stmt):
+        if stmt.initializer is not None:
+            stmt.initializer = self.fuse_expr(stmt.initializer)
+        return stmt
+
+    def visit_expression_stmt(self, stmt):
+        stmt.expr = self.fuse_expr(stmt.expr)
+        return stmt
+
+    def visit_print_stmt(self, stmt):
+        stmt.expr = self.fuse_expr(stmt.expr)
+        return stmt
+
+    def visit_return_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.fuse_expr(stmt.value)
+        return stmt
+
+    def visit_while_stmt(self, stmt):
+        stmt.condition = self.fuse_expr(stmt.condition)
+        stmt.body = self.fuse_stmt(stmt.body)
+        if not isinstance(stmt.condition, CompareLocalsExpr) or stmt.condition.left_distance is None:
+            return stmt
+        if stmt.condition.operator.kind in [TokenKind.EQUAL_EQUAL, TokenKind.BANG_EQUAL]:
+            return stmt
+        if not isinstance(stmt.body, BlockStmt) or len(stmt.body.stmts) == 0:
+            return stmt
+        last = stmt.body.stmts[-1]
+        if not isinstance(last, ExpressionStmt) or not isinstance(last.expr, IncrementExpr):
+            return stmt
+        # Counter in the loop body has to be the same variable as in the condition,
+        # the body block is one scope deeper than the condition, if it has a scope
+        depth = 1 if stmt.body.scoped else 0
+        if last.expr.name.lexeme != stmt.condition.left.name.lexeme or \
+           last.expr.distance != stmt.condition.left_distance + depth:
+            return stmt
+        stmt.body.stmts.pop()
+        self.fused += 1
+        loop = CountedLoopStmt(stmt.condition, stmt.body, last.expr, stmt.invariants)
+        loop.yields = stmt.yields
+        return loop
+
+    def visit_for_in_stmt(self, stmt):
+        stmt.iterable = self.fuse_expr(stmt.iterable)
+        stmt.body = self.fuse_stmt(stmt.body)
+        return stmt
+
+    def visit_import_stmt(self, stmt):
+        return stmt
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.fuse_expr(stmt.value)
+        return stmt
+
+    def visit_block_stmt(self, stmt):
+        self.fuse(stmt.stmts)
+        return stmt
+
+    def visit_break_stmt(self, stmt):
+        return stmt
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        return expr
+
+    def visit_this_expr(self, expr):
+        return expr
+
+    def visit_get_expr(self, expr):
+        expr.object = self.fuse_expr(expr.object)
+        return expr
+
+    def visit_set_expr(self, expr):
+        expr.object = self.fuse_expr(expr.object)
+        expr.value = self.fuse_expr(expr.value)
+        return expr
+
+    def visit_function_expr(self, expr):
+        self.fuse(expr.body)
+        return expr
+
+    def visit_logical_expr(self, expr):
+        expr.left = self.fuse_expr(expr.left)
+        expr.right = self.fuse_expr(expr.right)
+        return expr
+
+    def visit_call_expr(self, expr):
+        expr.callee = self.fuse_expr(expr.callee)
+        expr.arguments = [self.fuse_expr(arg) for arg in expr.arguments]
+        return expr
+
+    def visit_variable_expr(self, expr):
+        return expr
+
+    def visit_assign_expr(self, expr):
+        expr.value = self.fuse_expr(expr.value)
+        if expr.depth is None:
+            return expr
+        value = expr.value
+        if not isinstance(value, BinaryExpr) or value.operator.kind not in [TokenKind.PLUS, TokenKind.MINUS]:
+            return expr
+        if not isinstance(value.left, VariableExpr) or value.left.name.lexeme != expr.name.lexeme:
+            return expr
+        if value.left.depth != expr.depth or not self.is_number(value.right):
+            return expr
+        step = value.right.value
+        if value.operator.kind == TokenKind.MINUS:
+            step = -step
+        self.fused += 1
+        return IncrementExpr(expr.name, expr.depth, value.operator, step, value.numeric)
+
+    def visit_binary_expr(self, expr):
+        expr.left = self.fuse_expr(expr.left)
+        expr.right = self.fuse_expr(expr.right)
+        if expr.operator.kind not in COMPARISON_OPERATORS:
+            return expr
+        if not self.is_operand(expr.left) or not self.is_operand(expr.right):
+            return expr
+        if not isinstance(expr.left, VariableExpr) and not isinstance(expr.right, VariableExpr):
+            return expr
+        self.fused += 1
+        return CompareLocalsExpr(expr.left, expr.operator, expr.right,
+                                 expr.left.depth, expr.right.depth, expr.numeric)
+
+    def visit_grouping_expr(self, expr):
+        expr.expression = self.fuse_expr(expr.expression)
+        return expr
+
+    def visit_literal_expr(self, expr):
+        return expr
+
+    def visit_unary_expr(self, expr):
+        expr.right = self.fuse_expr(expr.right)
+        return expr
+
+    def visit_invariant_expr(self, expr):
+        expr.expression = self.fuse_expr(expr.expression)
+        return expr
+
+    def visit_await_expr(self, expr):
+        expr.value = self.fuse_expr(expr.value)
+        return expr
+
+    def is_operand(self, expr):
+        return isinstance(expr, VariableExpr) or isinstance(expr, LiteralExpr)
+
+    def is_number(self, expr):
+        return isinstance(expr, LiteralExpr) and isinstance(expr.value, float)
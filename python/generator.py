@@ -0,0 +1,214 @@
+from common import Visitor, Environment, Return, BreakException, RunTimeError, NativeError
+from natives import NativeObject, close_iterator
+from lists import List
+
+# NOTE: generator has no value ready
+MISSING = object()
+
+class GeneratorExecutor(Visitor):
+    # Executes body of generator function as Python generator, which is suspended at `yield`.
+    # Only statements containing `yield` (see Resolver.mark_yields) are executed here,
+    # everything else is executed by the interpreter as usual.
+    # Body of async function is run the same way, it is suspended at statements with `await`
+    # (see LangCoroutine).
+    # NOTE: interpreter environment is restored by LangGenerator after every step,
+    # so statements set their environment again when they are resumed.
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def run(self, stmts, env):
+        yield from self.execute_block(stmts, env)
+
+    def execute(self, stmt):
+        if stmt is None:
+            return ()
+        if not stmt.yields:
+            self.interpreter.execute(stmt)
+            return ()
+        return stmt.accept(self)
+
+    def execute_block(self, stmts, env):
+        interpreter = self.interpreter
+        previous = interpreter.env
+        interpreter.env = env
+        try:
+            for stmt in stmts:
+                yield from self.execute(stmt)
+        except Exception:
+            # NOTE: not `finally`, closed generator must not touch interpreter environment
+            interpreter.env = previous
+            raise
+        interpreter.env = previous
+
+    def execute_loop_body(self, body, env):
+        if env is None:
+            yield from self.execute(body)
+            return
+        env.values.clear()
+        yield from self.execute_block(body.stmts, env)
+
+    def visit_yield_stmt(self, stmt):
+        interpreter = self.interpreter
+        value = None
+        if stmt.value is not None:
+            value = interpreter.evaluate(stmt.value)
+        env = interpreter.env
+        yield value
+        interpreter.env = env
+
+    def execute_awaited(self, stmt):
+        # Suspends with the awaited value, the statement is then executed by the
+        # interpreter, which takes the result of `await` from Interpreter.awaited
+        interpreter = self.interpreter
+        expr = stmt.awaited
+        value = interpreter.evaluate(expr.value)
+        env = interpreter.env
+        try:
+            result = yield value
+        except NativeError as e:
+            raise RunTimeError(expr.keyword, str(e))
+        interpreter.env = env
+        interpreter.awaited[expr] = result
+        interpreter.execute(stmt)
+
+    def visit_expression_stmt(self, stmt):
+        return self.execute_awaited(stmt)
+
+    def visit_var_stmt(self, stmt):
+        return self.execute_awaited(stmt)
+
+    def visit_print_stmt(self, stmt):
+        return self.execute_awaited(stmt)
+
+    def visit_return_stmt(self, stmt):
+        return self.execute_awaited(stmt)
+
+    def visit_block_stmt(self, stmt):
+        if not stmt.scoped:
+            for s in stmt.stmts:
+                yield from self.execute(s)
+            return
+        yield from self.execute_block(stmt.stmts, Environment(self.interpreter.env))
+
+    def visit_if_stmt(self, stmt):
+        if self.interpreter.is_truthy(self.interpreter.evaluate(stmt.condition)):
+            yield from self.execute(stmt.then_branch)
+        else:
+            yield from self.execute(stmt.else_branch)
+
+    def visit_while_stmt(self, stmt):
+        interpreter = self.interpreter
+        env = interpreter.loop_environment(stmt.body)
+        try:
+            while interpreter.is_truthy(interpreter.evaluate(stmt.condition)):
+                yield from self.execute_loop_body(stmt.body, env)
+        except BreakException:
+            # DO NOTHING
+            pass
+
+    def visit_counted_loop_stmt(self, stmt):
+        interpreter = self.interpreter
+        increment = stmt.increment
+        # NOTE: increment is resolved inside the body, see Interpreter.visit_counted_loop_stmt
+        counter = interpreter.env.ancestor(stmt.condition.left_distance).values
+        name = increment.name.lexeme
+        env = interpreter.loop_environment(stmt.body)
+        try:
+            while interpreter.visit_compare_locals_expr(stmt.condition):
+                yield from self.execute_loop_body(stmt.body, env)
+                value = counter[name]
+                if increment.numeric or isinstance(value, float):
+                    counter[name] = value + increment.step
+                else:
+                    counter[name] = interpreter.increment_slow(increment, value)
+        except BreakException:
+            # DO NOTHING
+            pass
+
+    def visit_for_in_stmt(self, stmt):
+        interpreter = self.interpreter
+        iterator = interpreter.iterate(stmt.name, interpreter.evaluate(stmt.iterable))
+        previous = interpreter.env
+        interpreter.env = Environment(previous)
+        values = interpreter.env.values
+        name = stmt.name.lexeme
+        env = interpreter.loop_environment(stmt.body)
+        try:
+            for value in iterator:
+                values[name] = value
+                yield from self.execute_loop_body(stmt.body, env)
+        except BreakException:
+            # DO NOTHING
+            pass
+        except Exception:
+            interpreter.env = previous
+            raise
+        finally:
+            close_iterator(iterator)
+        interpreter.env = previous
+
+class LangGenerator(NativeObject):
+    # Result of calling generator function, values are computed lazily,
+    # when loop (or `next`) asks for them
+    def __init__(self, interpreter, frame):
+        super().__init__()
+        self.interpreter = interpreter
+        self.frame = frame
+        self.peeked = MISSING
+        # NOTE: globals of the module which created the generator, see modules.py
+        self.globals = interpreter.globals
+
+    def __str__(self):
+        return '<generator>'
+
+    def iterate(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        value = self.advance()
+        if value is MISSING:
+            raise StopIteration
+        return value
+
+    def advance(self):
+        # Next value of the generator, MISSING when it is finished
+        if self.peeked is not MISSING:
+            value, self.peeked = self.peeked, MISSING
+            return value
+        if self.frame is None:
+            return MISSING
+        interpreter = self.interpreter
+        previous, previous_globals = interpreter.env, interpreter.globals
+        interpreter.globals = self.globals
+        try:
+            return next(self.frame)
+        except (StopIteration, Return):
+            # NOTE: `return;` ends generator
+            self.frame = None
+            return MISSING
+        except Exception:
+            self.frame = None
+            raise
+        finally:
+            interpreter.env, interpreter.globals = previous, previous_globals
+
+    def next_value(self, interpreter):
+        value = self.advance()
+        return None if value is MISSING else value
+
+    def done(self, interpreter):
+        if self.peeked is MISSING:
+            self.peeked = self.advance()
+        return self.peeked is MISSING
+
+    def to_list(self, interpreter):
+        return List(list(self))
+
+    methods = {
+        'next': (0, next_value),
+        'done': (0, done),
+        'toList': (0, to_list),
+    }
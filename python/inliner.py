@@ -0,0 +1,721 @@
+from common import Visitor, Walker
+from tokens import Token, TokenKind
+from expr import *
+from stmt import *
+
+INLINE_BUDGET = 32
+
+class FunctionInfo:
+    def __init__(self, stmt, variable, index):
+        self.stmt = stmt
+        self.name = stmt.name.lexeme
+        # NOTE: None for global functions
+        self.variable = variable
+        # NOTE: index of top-level statement declaring global function
+        self.index = index
+        self.size = 0
+        self.free_globals = set()
+        self.inlinable = True
+        # NOTE: body is `var ...; return expr;` without side effects
+        self.pure_expression = False
+        # NOTE: body has no return (or only a trailing one), usable as a statement
+        self.statement = False
+
+class BodyAnalyzer(Visitor):
+    # Collects what Inliner has to know about function body
+    def __init__(self, info, bindings):
+        self.info = info
+        self.function = info.stmt.function
+        self.bindings = bindings
+        self.loop_depth = 0
+        self.returns = 0
+        self.impure = False
+
+    def analyze(self):
+        if self.function.is_async:
+            # NOTE: calling async function only creates a coroutine
+            self.reject()
+        if self.function.lazy is not None:
+            # NOTE: body is not parsed yet
+            self.reject()
+        self.walk(self.function.body)
+
+    def reject(self):
+        self.info.inlinable = False
+
+    def walk(self, stmts):
+        for stmt in stmts:
+            if stmt is None:
+                self.reject()
+            else:
+                self.info.size += 1
+                stmt.accept(self)
+
+    def walk_expr(self, expr):
+        self.info.size += 1
+        expr.accept(self)
+
+    def reference(self, expr):
+        variable = self.bindings.get(expr)
+        if variable is None:
+            if expr.name.lexeme == self.info.name and self.info.variable is None:
+                # Recursive global function
+                self.reject()
+            self.info.free_globals.add(expr.name.lexeme)
+        elif variable is self.info.variable:
+            # Recursive local function
+            self.reject()
+        elif variable.function is not self.function:
+            # NOTE: locals of enclosing functions may be shadowed at call site
+            self.reject()
+
+    def visit_class_stmt(self, stmt):
+        self.reject()
+
+    def visit_function_stmt(self, stmt):
+        self.reject()
+
+    def visit_if_stmt(self, stmt):
+        self.walk_expr(stmt.condition)
+        self.walk([stmt.then_branch])
+        if stmt.else_branch is not None:
+            self.walk([stmt.else_branch])
+
+    def visit_var_stmt(self, stmt):
+        if stmt.initializer is not None:
+            self.walk_expr(stmt.initializer)
+
+    def visit_expression_stmt(self, stmt):
+        self.walk_expr(stmt.expr)
+
+    def visit_print_stmt(self, stmt):
+        self.impure = True
+        self.walk_expr(stmt.expr)
+
+    def visit_return_stmt(self, stmt):
+        self.returns += 1
+        if stmt.value is not None:
+            self.walk_expr(stmt.value)
+
+    def visit_while_stmt(self, stmt):
+        self.walk_expr(stmt.condition)
+        self.loop_depth += 1
+        self.walk([stmt.body])
+        self.loop_depth -= 1
+
+    def visit_for_in_stmt(self, stmt):
+        self.walk_expr(stmt.iterable)
+        self.loop_depth += 1
+        self.walk([stmt.body])
+        self.loop_depth -= 1
+
+    def visit_yield_stmt(self, stmt):
+        # NOTE: generator body cannot be spliced into the caller
+        self.reject()
+
+    def visit_import_stmt(self, stmt):
+        self.reject()
+
+    def visit_block_stmt(self, stmt):
+        self.walk(stmt.stmts)
+
+    def visit_break_stmt(self, stmt):
+        if self.loop_depth == 0:
+            self.reject()
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        self.reject()
+
+    def visit_this_expr(self, expr):
+        self.reject()
+
+    def visit_get_expr(self, expr):
+        self.walk_expr(expr.object)
+
+    def visit_set_expr(self, expr):
+        self.impure = True
+        self.walk_expr(expr.object)
+        self.walk_expr(expr.value)
+
+    def visit_function_expr(self, expr):
+        self.reject()
+
+    def visit_logical_expr(self, expr):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_call_expr(self, expr):
+        self.impure = True
+        self.walk_expr(expr.callee)
+        for arg in expr.arguments:
+            self.walk_expr(arg)
+
+    def visit_variable_expr(self, expr):
+        self.reference(expr)
+
+    def visit_assign_expr(self, expr):
+        self.impure = True
+        self.reference(expr)
+        self.walk_expr(expr.value)
+
+    def visit_binary_expr(self, expr):
+        self.walk_expr(expr.left)
+        self.walk_expr(expr.right)
+
+    def visit_grouping_expr(self, expr):
+        self.walk_expr(expr.expression)
+
+    def visit_literal_expr(self, expr):
+        pass
+
+    def visit_unary_expr(self, expr):
+        self.walk_expr(expr.right)
+
+    def visit_await_expr(self, expr):
+        self.reject()
+
+class Cloner(Visitor):
+    # Copies function body, replacing parameters and locals:
+    # `substitutions` maps Variable to expression, `renames` maps Variable to new Token.
+    # Copies are bound to the variables of the originals, so a body with inlined calls
+    # can be inlined (cloned) again.
+    def __init__(self, bindings, substitutions, renames):
+        self.bindings = bindings
+        self.substitutions = substitutions
+        self.renames = renames
+
+    def clone(self, stmts):
+        return [self.clone_stmt(stmt) for stmt in stmts]
+
+    def clone_stmt(self, stmt):
+        if stmt is None:
+            return None
+        return stmt.accept(self)
+
+    def clone_expr(self, expr):
+        return expr.accept(self)
+
+    def name(self, token):
+        variable = self.bindings.get(token)
+        name = self.renames.get(variable, token)
+        if variable is not None:
+            self.bindings[name] = variable
+        return name
+
+    def bind(self, expr, variable):
+        if variable is not None:
+            self.bindings[expr] = variable
+        return expr
+
+    def visit_if_stmt(self, stmt):
+        return IfStmt(self.clone_expr(stmt.condition), self.clone_stmt(stmt.then_branch), self.clone_stmt(stmt.else_branch))
+
+    def visit_var_stmt(self, stmt):
+        initializer = None
+        if stmt.initializer is not None:
+            initializer = self.clone_expr(stmt.initializer)
+        return VarStmt(self.name(stmt.name), initializer)
+
+    def visit_expression_stmt(self, stmt):
+        return ExpressionStmt(self.clone_expr(stmt.expr))
+
+    def visit_print_stmt(self, stmt):
+        return PrintStmt(self.clone_expr(stmt.expr))
+
+    def visit_return_stmt(self, stmt):
+        value = None
+        if stmt.value is not None:
+            value = self.clone_expr(stmt.value)
+        return ReturnStmt(stmt.keyword, value)
+
+    def visit_while_stmt(self, stmt):
+        return WhileStmt(self.clone_expr(stmt.condition), self.clone_stmt(stmt.body))
+
+    def visit_for_in_stmt(self, stmt):
+        return ForInStmt(self.name(stmt.name), self.clone_expr(stmt.iterable), self.clone_stmt(stmt.body))
+
+    def visit_yield_stmt(self, stmt):
+        value = None
+        if stmt.value is not None:
+            value = self.clone_expr(stmt.value)
+        return YieldStmt(stmt.keyword, value)
+
+    def visit_import_stmt(self, stmt):
+        return ImportStmt(stmt.keyword, stmt.path, self.name(stmt.name))
+
+    def visit_block_stmt(self, stmt):
+        return BlockStmt(self.clone(stmt.stmts))
+
+    def visit_break_stmt(self, stmt):
+        return BreakStmt(stmt.name)
+
+    # Expressions
+    def visit_get_expr(self, expr):
+        return GetExpr(self.clone_expr(expr.object), expr.name)
+
+    def visit_set_expr(self, expr):
+        return SetExpr(self.clone_expr(expr.object), expr.name, self.clone_expr(expr.value))
+
+    def visit_logical_expr(self, expr):
+        return LogicalExpr(self.clone_expr(expr.left), expr.operator, self.clone_expr(expr.right))
+
+    def visit_call_expr(self, expr):
+        return CallExpr(self.clone_expr(expr.callee), expr.token, [self.clone_expr(arg) for arg in expr.arguments])
+
+    def visit_variable_expr(self, expr):
+        variable = self.bindings.get(expr)
+        if variable in self.substitutions:
+            return self.clone_expr(self.substitutions[variable])
+        return self.bind(VariableExpr(self.renames.get(variable, expr.name)), variable)
+
+    def visit_assign_expr(self, expr):
+        variable = self.bindings.get(expr)
+        return self.bind(AssignExpr(self.renames.get(variable, expr.name), self.clone_expr(expr.value)), variable)
+
+    def visit_binary_expr(self, expr):
+        return BinaryExpr(self.clone_expr(expr.left), expr.operator, self.clone_expr(expr.right))
+
+    def visit_grouping_expr(self, expr):
+        return GroupingExpr(self.clone_expr(expr.expression))
+
+    def visit_literal_expr(self, expr):
+        return LiteralExpr(expr.value)
+
+    def visit_unary_expr(self, expr):
+        return UnaryExpr(expr.operator, self.clone_expr(expr.right))
+
+    def visit_await_expr(self, expr):
+        return AwaitExpr(expr.keyword, self.clone_expr(expr.value))
+
+    def visit_this_expr(self, expr):
+        return ThisExpr(expr.keyword)
+
+class Inliner(Visitor):
+    # Inlines calls to small, non-recursive functions which are never reassigned.
+    #   Pure expression body, e.g. `fun sq(x) { return x * x; }`,
+    #   is inlined into any expression: `sq(a)` -> `a * a`.
+    #   Body without return, called as a statement, is inlined as a block:
+    #   `log(a);` -> `{ var msg$1 = a; print msg$1; }`.
+    # Locals of inlined body are renamed (names with "$" cannot be written in Lang).
+    # NOTE: must run after Resolver (it uses its bindings), program has to be
+    # resolved again after inlining.
+    def __init__(self, bindings, budget=INLINE_BUDGET):
+        self.bindings = bindings
+        self.budget = budget
+        self.functions = {}
+        self.global_functions = {}
+        self.global_declarations = {}
+        self.assigned = set()
+        self.assigned_globals = set()
+        self.scopes = []
+        self.function_depth = 0
+        self.index = 0
+        self.counter = 0
+        self.inlined = []
+
+    def inline(self, stmts):
+        self.collect(stmts)
+        for info in self.functions.values():
+            self.analyze(info)
+        for self.index in range(len(stmts)):
+            stmts[self.index] = self.inline_stmt(stmts[self.index])
+        return stmts
+
+    def report(self):
+        for line, name, kind in self.inlined:
+            print(f'[INLINE] line {line}: call to {name} inlined as {kind}')
+
+    # Collecting functions and assignments
+    def collect(self, stmts):
+        for index, stmt in enumerate(stmts):
+            if isinstance(stmt, (VarStmt, FunctionStmt, ClassStmt, ImportStmt)):
+                name = stmt.name.lexeme
+                self.global_declarations[name] = self.global_declarations.get(name, 0) + 1
+            if isinstance(stmt, FunctionStmt):
+                info = FunctionInfo(stmt, None, index)
+                self.functions[stmt] = info
+                self.global_functions[stmt.name.lexeme] = info
+        Collector(self).walk(stmts)
+
+    def analyze(self, info):
+        analyzer = BodyAnalyzer(info, self.bindings)
+        analyzer.analyze()
+        body = info.stmt.function.body
+        if info.size > self.budget:
+            info.inlinable = False
+        if info.variable is not None and info.variable in self.assigned:
+            info.inlinable = False
+        if info.variable is None:
+            name = info.name
+            if self.global_declarations.get(name) != 1 or name in self.assigned_globals:
+                info.inlinable = False
+        if not info.inlinable:
+            return
+        if not analyzer.impure and len(body) > 0 and isinstance(body[-1], ReturnStmt) and \
+           body[-1].value is not None and analyzer.returns == 1 and \
+           all([isinstance(s, VarStmt) and s.initializer is not None for s in body[:-1]]):
+            info.pure_expression = True
+        last_return = len(body) > 0 and isinstance(body[-1], ReturnStmt)
+        if analyzer.returns == 0 or (analyzer.returns == 1 and last_return):
+            info.statement = True
+
+    def candidate(self, callee):
+        if not isinstance(callee, VariableExpr):
+            return None
+        variable = self.bindings.get(callee)
+        if variable is None:
+            info = self.global_functions.get(callee.name.lexeme)
+            # NOTE: code before the declaration would fail to find the function, also code
+            # in bodies of functions declared before it, they may be called before it exists
+            if info is None or self.index <= info.index:
+                return None
+        else:
+            info = self.functions.get(variable)
+        if info is None or not info.inlinable:
+            return None
+        # Globals used by the body must not be shadowed at call site
+        for name in info.free_globals:
+            if any([name in scope for scope in self.scopes]):
+                return None
+        return info
+
+    def fresh_name(self, token):
+        self.counter += 1
+        return Token(TokenKind.IDENTIFIER, f'{token.lexeme}${self.counter}', None, token.line)
+
+    # Expression inlining
+    def inline_expression(self, expr, info):
+        function = info.stmt.function
+        if len(expr.arguments) != len(function.params):
+            return None
+        values = {}
+        for param, arg in zip(function.params, expr.arguments):
+            # NOTE: substituted arguments would be evaluated in the order of their uses,
+            # only values which cannot fail can be moved
+            if not self.is_trivial(arg):
+                return None
+            values[self.bindings.get(param)] = arg
+        cloner = Cloner(self.bindings, {}, {})
+        for stmt in function.body[:-1]:
+            cloner.substitutions = values
+            values[self.bindings.get(stmt.name)] = cloner.clone_expr(stmt.initializer)
+        result = function.body[-1].value
+        # Value used more than once (or not at all) is evaluated a different
+        # number of times, it is allowed only for values which cannot fail
+        counter = UseCounter(self.bindings)
+        counter.count(result)
+        for stmt in function.body[:-1]:
+            counter.count(stmt.initializer)
+        for variable, value in values.items():
+            if counter.uses.get(variable, 0) != 1 and not self.is_trivial(value):
+                return None
+        # Locals are evaluated where they are used, they have to be evaluated in order
+        # and before the rest of the result, as they are by the function
+        locals = [self.bindings.get(stmt.name) for stmt in function.body[:-1]
+                  if not self.is_trivial(values[self.bindings.get(stmt.name)])]
+        order = EvaluationOrder(self.bindings, function.body[:-1]).order(result)
+        if order[:len(locals)] != locals or any([step is not OTHER for step in order[len(locals):]]):
+            return None
+        cloner.substitutions = values
+        self.inlined.append((expr.token.line, info.name, 'expression'))
+        return cloner.clone_expr(result)
+
+    def is_trivial(self, expr):
+        if isinstance(expr, LiteralExpr):
+            return True
+        # NOTE: local variable is always defined, global may be not
+        return isinstance(expr, VariableExpr) and self.bindings.get(expr) is not None
+
+    # Statement inlining
+    def inline_statement(self, stmt, info):
+        function = info.stmt.function
+        expr = stmt.expr
+        if len(expr.arguments) != len(function.params):
+            return None
+        renames = {}
+        for declaration in Declarations(self.bindings).collect(function):
+            renames[declaration] = self.fresh_name(declaration.name)
+        stmts = []
+        for param, arg in zip(function.params, expr.arguments):
+            variable = self.bindings.get(param)
+            self.bindings[renames[variable]] = variable
+            stmts.append(VarStmt(renames[variable], arg))
+        body = Cloner(self.bindings, {}, renames).clone(function.body)
+        if len(body) > 0 and isinstance(body[-1], ReturnStmt):
+            ret = body.pop()
+            if ret.value is not None:
+                body.append(ExpressionStmt(ret.value))
+        self.inlined.append((expr.token.line, info.name, 'statement'))
+        return BlockStmt(stmts + body)
+
+    # Rewriting
+    def inline_stmts(self, stmts):
+        for i in range(len(stmts)):
+            stmts[i] = self.inline_stmt(stmts[i])
+        return stmts
+
+    def inline_stmt(self, stmt):
+        if stmt is None:
+            return None
+        return stmt.accept(self)
+
+    def inline_expr(self, expr):
+        return expr.accept(self)
+
+    def declare(self, name):
+        if len(self.scopes) > 0:
+            self.scopes[-1].add(name.lexeme)
+
+    def inline_function(self, function):
+        self.function_depth += 1
+        self.scopes.append(set([param.lexeme for param in function.params]))
+        self.inline_stmts(function.body)
+        self.scopes.pop()
+        self.function_depth -= 1
+
+    def visit_class_stmt(self, stmt):
+        self.declare(stmt.name)
+        for method in stmt.methods:
+            self.inline_function(method.function)
+        return stmt
+
+    def visit_function_stmt(self, stmt):
+        self.declare(stmt.name)
+        self.inline_function(stmt.function)
+        return stmt
+
+    def visit_if_stmt(self, stmt):
+        stmt.condition = self.inline_expr(stmt.condition)
+        stmt.then_branch = self.inline_stmt(stmt.then_branch)
+        stmt.else_branch = self.inline_stmt(stmt.else_branch)
+        return stmt
+
+    def visit_var_stmt(self, stmt):
+        if stmt.initializer is not None:
+            stmt.initializer = self.inline_expr(stmt.initializer)
+        self.declare(stmt.name)
+        return stmt
+
+    def visit_expression_stmt(self, stmt):
+        if isinstance(stmt.expr, CallExpr):
+            info = self.candidate(stmt.expr.callee)
+            if info is not None and info.statement:
+                stmt.expr.arguments = [self.inline_expr(arg) for arg in stmt.expr.arguments]
+                block = self.inline_statement(stmt, info)
+                if block is not None:
+                    return block
+        stmt.expr = self.inline_expr(stmt.expr)
+        return stmt
+
+    def visit_print_stmt(self, stmt):
+        stmt.expr = self.inline_expr(stmt.expr)
+        return stmt
+
+    def visit_return_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.inline_expr(stmt.value)
+        return stmt
+
+    def visit_while_stmt(self, stmt):
+        stmt.condition = self.inline_expr(stmt.condition)
+        stmt.body = self.inline_stmt(stmt.body)
+        return stmt
+
+    def visit_for_in_stmt(self, stmt):
+        stmt.iterable = self.inline_expr(stmt.iterable)
+        self.scopes.append(set([stmt.name.lexeme]))
+        stmt.body = self.inline_stmt(stmt.body)
+        self.scopes.pop()
+        return stmt
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.inline_expr(stmt.value)
+        return stmt
+
+    def visit_import_stmt(self, stmt):
+        self.declare(stmt.name)
+        return stmt
+
+    def visit_block_stmt(self, stmt):
+        self.scopes.append(set())
+        self.inline_stmts(stmt.stmts)
+        self.scopes.pop()
+        return stmt
+
+    def visit_break_stmt(self, stmt):
+        return stmt
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        return expr
+
+    def visit_this_expr(self, expr):
+        return expr
+
+    def visit_get_expr(self, expr):
+        expr.object = self.inline_expr(expr.object)
+        return expr
+
+    def visit_set_expr(self, expr):
+        expr.object = self.inline_expr(expr.object)
+        expr.value = self.inline_expr(expr.value)
+        return expr
+
+    def visit_function_expr(self, expr):
+        self.inline_function(expr)
+        return expr
+
+    def visit_logical_expr(self, expr):
+        expr.left = self.inline_expr(expr.left)
+        expr.right = self.inline_expr(expr.right)
+        return expr
+
+    def visit_call_expr(self, expr):
+        expr.arguments = [self.inline_expr(arg) for arg in expr.arguments]
+        info = self.candidate(expr.callee)
+        if info is not None and info.pure_expression:
+            inlined = self.inline_expression(expr, info)
+            if inlined is not None:
+                return inlined
+        expr.callee = self.inline_expr(expr.callee)
+        return expr
+
+    def visit_variable_expr(self, expr):
+        return expr
+
+    def visit_assign_expr(self, expr):
+        expr.value = self.inline_expr(expr.value)
+        return expr
+
+    def visit_binary_expr(self, expr):
+        expr.left = self.inline_expr(expr.left)
+        expr.right = self.inline_expr(expr.right)
+        return expr
+
+    def visit_grouping_expr(self, expr):
+        expr.expression = self.inline_expr(expr.expression)
+        return expr
+
+    def visit_literal_expr(self, expr):
+        return expr
+
+    def visit_unary_expr(self, expr):
+        expr.right = self.inline_expr(expr.right)
+        return expr
+
+    def visit_await_expr(self, expr):
+        expr.value = self.inline_expr(expr.value)
+        return expr
+
+class Collector(Walker):
+    # Finds local functions and every assignment in the program
+    def __init__(self, inliner):
+        self.inliner = inliner
+
+    def visit_function_stmt(self, stmt):
+        variable = self.inliner.bindings.get(stmt.name)
+        if variable is not None:
+            self.inliner.functions[variable] = FunctionInfo(stmt, variable, None)
+        self.walk_expr(stmt.function)
+
+    def visit_assign_expr(self, expr):
+        variable = self.inliner.bindings.get(expr)
+        if variable is None:
+            self.inliner.assigned_globals.add(expr.name.lexeme)
+        else:
+            self.inliner.assigned.add(variable)
+        self.walk_expr(expr.value)
+
+class Declarations(Walker):
+    # Variables declared by function: parameters and locals in its body
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.declarations = []
+
+    def collect(self, function):
+        self.declarations = [self.bindings.get(param) for param in function.params]
+        self.walk(function.body)
+        return self.declarations
+
+    def visit_var_stmt(self, stmt):
+        self.declarations.append(self.bindings.get(stmt.name))
+        if stmt.initializer is not None:
+            self.walk_expr(stmt.initializer)
+
+    def visit_for_in_stmt(self, stmt):
+        self.declarations.append(self.bindings.get(stmt.name))
+        super().visit_for_in_stmt(stmt)
+
+    def visit_assign_expr(self, expr):
+        self.walk_expr(expr.value)
+
+class UseCounter(Walker):
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.uses = {}
+        self.conditional = False
+
+    def count(self, expr):
+        self.walk_expr(expr)
+
+    def visit_variable_expr(self, expr):
+        variable = self.bindings.get(expr)
+        # NOTE: use in right side of "and"/"or" may not be evaluated, so it counts as two
+        uses = 2 if self.conditional else 1
+        self.uses[variable] = self.uses.get(variable, 0) + uses
+
+    def visit_logical_expr(self, expr):
+        self.walk_expr(expr.left)
+        conditional = self.conditional
+        self.conditional = True
+        self.walk_expr(expr.right)
+        self.conditional = conditional
+
+# NOTE: step of EvaluationOrder which is not a local
+OTHER = object()
+
+class EvaluationOrder(Walker):
+    # Steps of inlined expression body which can fail, in the order the interpreter
+    # evaluates them: values of locals (substituted into the result) and other
+    # expressions of the result (OTHER)
+    def __init__(self, bindings, stmts):
+        self.bindings = bindings
+        self.initializers = {bindings.get(stmt.name): stmt.initializer for stmt in stmts}
+        self.steps = []
+        # NOTE: steps inside values of locals are part of the local
+        self.nested = 0
+
+    def order(self, expr):
+        self.walk_expr(expr)
+        return self.steps
+
+    def step(self):
+        if self.nested == 0:
+            self.steps.append(OTHER)
+
+    def visit_variable_expr(self, expr):
+        variable = self.bindings.get(expr)
+        if variable in self.initializers:
+            self.nested += 1
+            self.walk_expr(self.initializers[variable])
+            self.nested -= 1
+            self.steps.append(variable)
+        elif variable is None:
+            # NOTE: global may be undefined
+            self.step()
+
+    def visit_get_expr(self, expr):
+        self.walk_expr(expr.object)
+        self.step()
+
+    def visit_binary_expr(self, expr):
+        # NOTE: interpreter evaluates the right operand first
+        self.walk_expr(expr.right)
+        self.walk_expr(expr.left)
+        self.step()
+
+    def visit_unary_expr(self, expr):
+        self.walk_expr(expr.right)
+        self.step()
@@ -1,19 +1,70 @@
 
+import operator
 from tokens import TokenKind
-from common import RunTimeError, Return, BreakException, Environment, Visitor
+from common import RunTimeError, NativeError, Return, BreakException, Environment, GlobalEnvironment, Visitor, stringify, format_number
 from klass import LangClass, LangInstance
 from expr import *
 from stmt import *
 from function import *
+from memoize import Memoize, MemoStats
+from natives import NativeObject, register, iterate, close_iterator
+# NOTE: modules below register their natives on import
+import lists
+import maps
+import stringbuilder
+import files
+import formats
+import parallel
+import shared
+from generator import GeneratorExecutor, LangGenerator
+from coroutine import LangCoroutine
+from lazy import compile_lazy
+from modules import import_module
+import aio
+
+# NOTE: natives of all modules (see natives.py), the base of globals of every interpreter,
+# so a new interpreter does not copy them
+NATIVES = GlobalEnvironment()
+register(NATIVES)
+NATIVES.define('memoize', Memoize())
+NATIVES.define('memoStats', MemoStats())
+
+# NOTE: used for BinaryExpr with operands proven to be numbers by TypeInferrer
+NUMERIC_OPERATORS = {
+    TokenKind.GREATER: operator.gt,
+    TokenKind.GREATER_EQUAL: operator.ge,
+    TokenKind.LESS: operator.lt,
+    TokenKind.LESS_EQUAL: operator.le,
+    TokenKind.MINUS: operator.sub,
+    TokenKind.PLUS: operator.add,
+    TokenKind.SLASH: operator.truediv,
+    TokenKind.STAR: operator.mul
+}
+
+# NOTE: marks InvariantExpr which is not evaluated yet, nil is a valid value
+MISSING = object()
 
 class Interpreter(Visitor):
-    def __init__(self):
-        self.globals = Environment()
+    def __init__(self, stdout=None, base=None):
+        # NOTE: base is shared with other interpreters, see GlobalEnvironment
+        self.globals = GlobalEnvironment(NATIVES if base is None else base)
         self.env = self.globals
-        self.locals = {}
-        # NOTE: Clock in a native function
-        # TODO: Add function to interact with file, I\O etc.
-        self.globals.define('clock', Clock())
+        # NOTE: globals of the program, while an imported module runs
+        # self.globals are globals of the module (see modules.py)
+        self.main_globals = self.globals
+        # NOTE: Lang class which compiles imported modules, directory they are relative to
+        self.compiler = None
+        self.directory = None
+        # NOTE: modules imported by this interpreter by absolute path, every module runs once
+        # per interpreter, so programs run one after another (e.g. --batch) do not share them
+        self.modules = {}
+        # NOTE: file written by print, None means sys.stdout
+        self.stdout = stdout
+        # NOTE: values of InvariantExpr of the running loops, by id of the expression
+        self.invariants = {}
+        # NOTE: results of AwaitExpr by the expression, set by GeneratorExecutor
+        # just before the statement with the AwaitExpr runs
+        self.awaited = {}
 
     def interpret(self, stmts):
         if stmts is None:
@@ -21,19 +72,12 @@ class Interpreter(Visitor):
         for stmt in [s for s in stmts if s is not None]:
             yield self.execute(stmt)
     
-    def resolve(self, expr, depth):
-        self.locals[expr] = depth
+    def compile_lazy(self, function):
+        # Body of lazy function (see LazyBody), errors are reported to the output
+        compile_lazy(function, self.stdout)
 
     def stringify(self, obj):
-        if obj is None:
-            return 'nil'
-        if isinstance(obj, float):
-            t = str(obj)
-            if t.endswith('.0'):
-                return t[:-2]
-        if isinstance(obj, str):
-            return f'"{obj}"'
-        return str(obj)
+        return stringify(obj)
     
     def visit_class_stmt(self, stmt):
         super_class = None
@@ -48,7 +92,7 @@ class Interpreter(Visitor):
         methods = {}
         for method in stmt.methods:
             is_initializer = method.name.lexeme == 'init'
-            function = LangFunction(method.name.lexeme, method.function, self.env, is_initializer)
+            function = LangFunction(method.name.lexeme, method.function, self.closure(method.function), is_initializer, self.module_globals())
             methods[method.name.lexeme] = function
         if stmt.super_class is not None:
             self.env = self.env.enclosing
@@ -58,11 +102,38 @@ class Interpreter(Visitor):
     
     def visit_function_stmt(self, stmt):
         name = stmt.name.lexeme
-        func = LangFunction(name, stmt.function, self.env, False)
+        func = LangFunction(name, stmt.function, self.closure(stmt.function), False, self.module_globals())
         self.env.define(name, func)
     
     def visit_function_expr(self, expr):
-        return LangFunction('', expr, self.env, False)
+        return LangFunction('', expr, self.closure(expr), False, self.module_globals())
+
+    def module_globals(self):
+        # Globals kept by new function, None outside of imported modules
+        return None if self.globals is self.main_globals else self.globals
+
+    def closure(self, function):
+        # Function keeps only environments it uses (see Resolver.capture),
+        # so e.g. lambda created in a loop does not keep the whole chain alive
+        captures = function.captures
+        if captures is None:
+            return self.env
+        if len(captures) == 0:
+            # NOTE: function uses only its own locals and globals
+            return None
+        depth = max(captures)
+        last = self.env.ancestor(depth)
+        if len(captures) == depth + 1 and (last.enclosing is None or last.enclosing is self.globals):
+            return self.env
+        envs = []
+        env = self.env
+        for level in range(depth + 1):
+            # NOTE: unused levels are kept as empty environments, to keep distances
+            envs.append(Environment(None, env.values if level in captures else None))
+            env = env.enclosing
+        for level in range(depth):
+            envs[level].enclosing = envs[level + 1]
+        return envs[0]
 
     def visit_if_stmt(self, stmt):
         if self.is_truthy(self.evaluate(stmt.condition)):
@@ -81,30 +152,115 @@ class Interpreter(Visitor):
 
     def visit_print_stmt(self, stmt):
         value = self.evaluate(stmt.expr)
-        print(self.stringify(value))
+        print(self.stringify(value), file=self.stdout)
     
     def visit_return_stmt(self, stmt):
         value = None
-        if stmt is not None:
+        if stmt.value is not None:
             value = self.evaluate(stmt.value)
         raise Return(value)
 
+    def visit_yield_stmt(self, stmt):
+        # NOTE: statements with `yield` are executed by GeneratorExecutor
+        raise RunTimeError(stmt.keyword, 'Cannot yield outside of a generator')
+
+    def visit_import_stmt(self, stmt):
+        self.env.define(stmt.name.lexeme, import_module(self, stmt))
+
+    def generator(self, body, env):
+        return LangGenerator(self, GeneratorExecutor(self).run(body, env))
+
+    def coroutine(self, body, env):
+        return LangCoroutine(self, GeneratorExecutor(self).run(body, env))
+
     def visit_while_stmt(self, stmt):
+        env = self.loop_environment(stmt.body)
+        saved = self.enter_invariants(stmt.invariants)
         try:
             while self.is_truthy(self.evaluate(stmt.condition)):
-                self.execute(stmt.body)
+                self.execute_loop_body(stmt.body, env)
+        except BreakException:
+            # DO NOTHING
+            pass
+        finally:
+            self.exit_invariants(saved)
+
+    def visit_for_in_stmt(self, stmt):
+        iterator = self.iterate(stmt.name, self.evaluate(stmt.iterable))
+        previous = self.env
+        # NOTE: one environment holds the loop variable for the whole loop
+        self.env = Environment(previous)
+        values = self.env.values
+        name = stmt.name.lexeme
+        env = self.loop_environment(stmt.body)
+        saved = self.enter_invariants(stmt.invariants)
+        try:
+            for value in iterator:
+                values[name] = value
+                self.execute_loop_body(stmt.body, env)
         except BreakException:
             # DO NOTHING
             pass
+        finally:
+            self.exit_invariants(saved)
+            self.env = previous
+            close_iterator(iterator)
+
+    def iterate(self, token, iterable):
+        try:
+            iterator = iterate(iterable)
+        except NativeError as e:
+            raise RunTimeError(token, str(e))
+        if iterator is None:
+            raise RunTimeError(token, 'Can only iterate over lists, maps, ranges, generators and strings')
+        return iterator
 
     def visit_block_stmt(self, stmt):
+        if not stmt.scoped:
+            for s in stmt.stmts:
+                self.execute(s)
+            return
         self.execute_block(stmt.stmts, Environment(self.env))
+
+    def loop_environment(self, body):
+        # NOTE: when no closure captures variables of the loop body,
+        # nothing outlives an iteration and one environment is reused for all of them
+        if isinstance(body, BlockStmt) and body.scoped and not body.captured:
+            return Environment(self.env)
+        return None
+
+    def execute_loop_body(self, body, env):
+        if env is None:
+            self.execute(body)
+            return
+        env.values.clear()
+        self.execute_block(body.stmts, env)
     
+    def enter_invariants(self, invariants):
+        # Invariants are computed again on every execution of the loop, values of
+        # an outer execution of the same loop (recursion) are restored on exit
+        if not invariants:
+            return None
+        saved = []
+        for invariant in invariants:
+            key = id(invariant)
+            saved.append((key, self.invariants.pop(key, MISSING)))
+        return saved
+
+    def exit_invariants(self, saved):
+        if saved is None:
+            return
+        for key, value in saved:
+            if value is MISSING:
+                self.invariants.pop(key, None)
+            else:
+                self.invariants[key] = value
+
     def visit_break_stmt(self, stmt):
         raise BreakException(stmt.name)
 
     def visit_super_expr(self, expr):
-        distance = self.locals[expr]
+        distance = expr.depth
         super_class = self.env.get_at(distance, 'super')
         obj = self.env.get_at(distance-1, 'this')
         method = super_class.find_method(expr.method.lexeme)
@@ -118,7 +274,7 @@ class Interpreter(Visitor):
     
     def visit_get_expr(self, expr):
         obj = self.evaluate(expr.object)
-        if isinstance(obj, LangInstance):
+        if isinstance(obj, LangInstance) or isinstance(obj, NativeObject):
             return obj.get(expr.name)
         raise RunTimeError(expr.name, 'Only instances have properties.')
 
@@ -145,19 +301,21 @@ class Interpreter(Visitor):
         callee = self.evaluate(expr.callee)
         args = [self.evaluate(arg) for arg in expr.arguments]
         if not isinstance(callee, LangCallable):
-            raise RuntimeError(expr.paren, 'Can only call functions and classes')
+            raise RunTimeError(expr.token, 'Can only call functions and classes')
         if len(args) != callee.arity():
-            raise RuntimeError(expr.paren, f'Expected {callee.arity()} arguments but got {len(args)}')
-        return callee.call(self, args)
+            raise RunTimeError(expr.token, f'Expected {callee.arity()} arguments but got {len(args)}')
+        try:
+            return callee.call(self, args)
+        except NativeError as e:
+            raise RunTimeError(expr.token, str(e))
 
     def visit_variable_expr(self, expr):
         return self.look_up_variable(expr.name, expr)
 
     def visit_assign_expr(self, expr):
         value = self.evaluate(expr.value)
-        if expr in self.locals:
-            distance = self.locals[expr]
-            self.env.assign_at(distance, expr.name, value)
+        if expr.depth is not None:
+            self.env.assign_at(expr.depth, expr.name, value)
         else:
             self.globals.assign(expr.name, value)
         return value
@@ -165,6 +323,8 @@ class Interpreter(Visitor):
     def visit_binary_expr(self, expr):
         right = self.evaluate(expr.right)
         left  = self.evaluate(expr.left)
+        if expr.numeric:
+            return NUMERIC_OPERATORS[expr.operator.kind](left, right)
         if expr.operator.kind == TokenKind.GREATER:
             self.check_number_operand(expr.operator, left, right)
             return float(left) > float(right)
@@ -181,18 +341,7 @@ class Interpreter(Visitor):
             self.check_number_operand(expr.operator, left, right)
             return float(left) - float(right)
         if expr.operator.kind == TokenKind.PLUS:
-            if isinstance(left, float) and isinstance(right, float):
-                return float(left) + float(right)
-            if isinstance(left, str) and isinstance(right, str):
-                return str(left) + str(right)
-            if isinstance(left, str) and isinstance(right, float) or isinstance(left, float) and isinstance(right, str):
-                if isinstance(left, float):
-                    t = str(left)
-                    return t[:-2] + str(right) if t.endswith('.0') else str(left) + str(right)
-                if isinstance(right, float):
-                    t = str(right)
-                    return str(left) + t[:-2] if t.endswith('.0') else str(left) + str(right)
-            raise RunTimeError(expr.operator, 'Operands must be two numbers or two strings')
+            return self.add(expr.operator, left, right)
         if expr.operator.kind == TokenKind.SLASH:
             self.check_number_operand(expr.operator, left, right)
             if float(right) == 0:
@@ -208,6 +357,17 @@ class Interpreter(Visitor):
         # Unreachable
         return None
 
+    def add(self, operator, left, right):
+        if isinstance(left, float) and isinstance(right, float):
+            return float(left) + float(right)
+        if isinstance(left, str) and isinstance(right, str):
+            return str(left) + str(right)
+        if isinstance(left, str) and isinstance(right, float):
+            return left + format_number(right)
+        if isinstance(left, float) and isinstance(right, str):
+            return format_number(left) + right
+        raise RunTimeError(operator, 'Operands must be two numbers or two strings')
+
     def visit_grouping_expr(self, expr):
         return self.evaluate(expr.expression)
 
@@ -219,15 +379,85 @@ class Interpreter(Visitor):
         if expr.operator.kind == TokenKind.BANG:
             return not self.is_truthy(right)
         if expr.operator.kind == TokenKind.MINUS:
-            self.check_number_operand(expr.operator, right)
+            if expr.numeric:
+                return -right
+            self.check_number_operand_unary(expr.operator, right)
             return -float(right)
         # Unreachable
         return None
 
+    def visit_counted_loop_stmt(self, stmt):
+        condition = stmt.condition
+        increment = stmt.increment
+        # NOTE: counter lives in the same environment for the whole loop
+        counter = self.env.ancestor(condition.left_distance).values
+        name = increment.name.lexeme
+        env = self.loop_environment(stmt.body)
+        saved = self.enter_invariants(stmt.invariants)
+        try:
+            while self.visit_compare_locals_expr(condition):
+                self.execute_loop_body(stmt.body, env)
+                value = counter[name]
+                if increment.numeric or isinstance(value, float):
+                    counter[name] = value + increment.step
+                else:
+                    counter[name] = self.increment_slow(increment, value)
+        except BreakException:
+            # DO NOTHING
+            pass
+        finally:
+            self.exit_invariants(saved)
+
+    def visit_compare_locals_expr(self, expr):
+        right = self.fused_operand(expr.right, expr.right_distance)
+        left = self.fused_operand(expr.left, expr.left_distance)
+        kind = expr.operator.kind
+        if kind == TokenKind.EQUAL_EQUAL:
+            return self.is_equal(left, right)
+        if kind == TokenKind.BANG_EQUAL:
+            return not self.is_equal(left, right)
+        if not expr.numeric:
+            self.check_number_operand(expr.operator, left, right)
+        return NUMERIC_OPERATORS[kind](left, right)
+
+    def visit_increment_expr(self, expr):
+        values = self.env.ancestor(expr.distance).values
+        value = values[expr.name.lexeme]
+        if expr.numeric or isinstance(value, float):
+            value = value + expr.step
+        else:
+            value = self.increment_slow(expr, value)
+        values[expr.name.lexeme] = value
+        return value
+
+    def visit_invariant_expr(self, expr):
+        value = self.invariants.get(id(expr), MISSING)
+        if value is MISSING:
+            value = self.evaluate(expr.expression)
+            self.invariants[id(expr)] = value
+        return value
+
+    def visit_await_expr(self, expr):
+        value = self.awaited.pop(expr, MISSING)
+        if value is MISSING:
+            raise RunTimeError(expr.keyword, 'Cannot await outside of an async function')
+        return value
+
+    def increment_slow(self, expr, value):
+        if expr.operator.kind == TokenKind.PLUS:
+            return self.add(expr.operator, value, expr.step)
+        self.check_number_operand(expr.operator, value, -expr.step)
+
+    def fused_operand(self, expr, distance):
+        if isinstance(expr, LiteralExpr):
+            return expr.value
+        if distance is None:
+            return self.globals.get(expr.name)
+        return self.env.ancestor(distance).values[expr.name.lexeme]
+
     def look_up_variable(self, name, expr):
-        if expr in self.locals:
-            distance = self.locals[expr]
-            return self.env.get_at(distance, name.lexeme)
+        if expr.depth is not None:
+            return self.env.get_at(expr.depth, name.lexeme)
         else:
             return self.globals.get(name)
 
@@ -259,10 +489,10 @@ class Interpreter(Visitor):
             return True
         return left == right
 
-    def check_number_operand(self, operator, operand):
+    def check_number_operand_unary(self, operator, operand):
         if isinstance(operand, float):
             return 
-        raise RunTimeError(operand, 'Operand must be a number')
+        raise RunTimeError(operator, 'Operand must be a number')
 
     def check_number_operand(self, operator, left, right):
         if isinstance(left, float) and isinstance(right, float):
@@ -8,13 +8,58 @@ from parser import Parser
 from interpreter import Interpreter
 from resolver import Resolver
 from astprinter import AstPrinter
+from typeinferrer import TypeInferrer
+from fuser import Fuser
+from inliner import Inliner
+from loopoptimizer import LoopOptimizer
+from natives import cleanup
+from batch import run_batch
+from serve import serve
+from snapshot import save_snapshot, load_snapshot, SnapshotError
 
 PRINT_AST = int(os.getenv('PRINTAST') or 0)
+PRINT_TYPES = int(os.getenv('PRINTTYPES') or 0)
+PRINT_INLINE = int(os.getenv('PRINTINLINE') or 0)
+# NOTE: optimization passes can be turned off, e.g. for benchmarks
+INFER_TYPES = int(os.getenv('INFERTYPES') or 1)
+FUSE = int(os.getenv('FUSE') or 1)
+INLINE = int(os.getenv('INLINE') or 1)
+LOOP_OPT = int(os.getenv('LOOPOPT') or 1)
+# NOTE: bodies of top-level functions and methods are parsed when they are called
+# the first time, errors in them are reported then too
+LAZY_PARSE = int(os.getenv('LAZYPARSE') or 0)
+# NOTE: compiled modules are cached per options, see modules.py
+OPTIONS = (INFER_TYPES, FUSE, INLINE, LOOP_OPT, LAZY_PARSE)
+
+class Program:
+    # Compiled statements (see Lang.compile). Running does not change them, so one
+    # program can be run many times, also by many threads at once.
+    def __init__(self, stmts):
+        self.stmts = tuple(stmts)
+
+    def run(self, globals=None, stdout=None, errors=None, base=None, directory=None):
+        # Runs in a new Lang with globals (dict of names and values) defined, print writes
+        # to stdout, errors to errors (both default to sys.stdout). Returns the Lang,
+        # e.g. for had_runtime_error or interpreter.globals. Globals of the run are layered
+        # over base (e.g. interpreter.globals of a library run), see GlobalEnvironment.
+        # Imported modules are relative to directory (default: the current directory).
+        lang = Lang(stdout, errors, base)
+        lang.interpreter.directory = directory
+        if globals is not None:
+            for name, value in globals.items():
+                lang.interpreter.globals.define(name, value)
+        lang.execute(self)
+        return lang
 
 class Lang:
-    def __init__(self):
-        self.interpreter = Interpreter()
-        self.eh = ErrorHandler(self)
+    options = OPTIONS
+
+    def __init__(self, stdout=None, errors=None, base=None):
+        self.interpreter = Interpreter(stdout, base)
+        # NOTE: imported modules are compiled as the program is
+        self.interpreter.compiler = type(self)
+        # NOTE: errors go where the output goes, unless they have their own file
+        self.eh = ErrorHandler(self, stdout if errors is None else errors)
         self.had_error = False
         self.had_runtime_error = False
 
@@ -33,43 +78,105 @@ class Lang:
         except FileNotFoundError:
             self.eh.error(0, f'cannot open {source_file}')
             exit(68)
+        # NOTE: paths of imported modules are relative to the file which imports them
+        self.interpreter.directory = os.path.dirname(os.path.abspath(source_file))
         self.run(source_code)
+        # NOTE: e.g. files left open by the program are closed (and flushed) before exit
+        cleanup()
+        status = self.exit_status()
+        if status != 0:
+            exit(status)
+
+    def exit_status(self):
         if self.had_error:
-            exit(69)
+            return 69
         if self.had_runtime_error:
-            exit(70)
+            return 70
+        return 0
 
     def run(self, source_code, is_prompt=False):
         if source_code == 'exit()': exit(0)
+        program = self.compile(source_code, is_prompt)
+        if self.had_error: return
+        self.execute(program, is_prompt)
+
+    def compile(self, source_code, is_prompt=False):
+        # Program ready to be run, None when there are errors (reported to self.eh)
         lexer = Lexer(source_code, self.eh)
         tokens = lexer.tokenize()
-        parser = Parser(tokens, self.eh)
+        lazy = None
+        if LAZY_PARSE == 1 and not is_prompt:
+            lazy = (INFER_TYPES, LOOP_OPT, FUSE)
+        parser = Parser(tokens, self.eh, lazy)
         stmts = parser.parse()
         if PRINT_AST == 1:
             ast_printer = AstPrinter()
             for s in stmts: print(ast_printer.printStmt(s))
-        if self.had_error: return
-        resolver = Resolver(self.interpreter, self.eh)
+        if self.had_error: return None
+        resolver = Resolver(self.eh)
         resolver.resolve(stmts)
-        if self.had_error: return
+        if self.had_error: return None
+        # NOTE: in REPL functions can be redefined by later lines, so nothing is inlined
+        if INLINE == 1 and not is_prompt:
+            inliner = Inliner(resolver.bindings)
+            inliner.inline(stmts)
+            if PRINT_INLINE == 1: inliner.report()
+            if len(inliner.inlined) > 0:
+                # Inlined code has to be resolved again, warnings were already reported
+                resolver = Resolver(self.eh, False)
+                resolver.resolve(stmts)
+        if INFER_TYPES == 1:
+            inferrer = TypeInferrer(resolver.bindings)
+            inferrer.infer(stmts)
+            if PRINT_TYPES == 1: inferrer.report()
+        if LOOP_OPT == 1:
+            LoopOptimizer(resolver.bindings).optimize(stmts)
+        if FUSE == 1:
+            Fuser().fuse(stmts)
+        return Program(stmts)
+
+    def execute(self, program, is_prompt=False):
         # NOTE: sometimes stmts may contains None values,
         # skipping them may be a good idea, to run interpreter on valid statements
         try:
             # TODO: come up with better solution then generator.
-            gen = self.interpreter.interpret(stmts)
+            gen = self.interpreter.interpret(program.stmts)
             for v in [g for g in gen if g is not None]: 
-                if is_prompt: print(v)
+                if is_prompt: print(v, file=self.interpreter.stdout)
         except RunTimeError as e:
             self.eh.runtime_error(e)
 
 if __name__ == '__main__':
-    lang = Lang()
-    if len(sys.argv) > 2:
-        print("ERROR: USAGE 'main.py <source file>'")
+    args = sys.argv[1:]
+    if len(args) > 0 and args[0] == '--batch':
+        exit(run_batch(Lang, args[1:]))
+    if len(args) == 2 and args[0] == '--serve':
+        exit(serve(Lang, args[1]))
+    if len(args) == 3 and args[0] == '--save-snapshot':
+        lang = Lang()
+        lang.run_file(args[2])
+        try:
+            save_snapshot(lang.interpreter.globals, args[1])
+        except (SnapshotError, OSError) as e:
+            print(f'ERROR: cannot save snapshot {args[1]}: {e}')
+            exit(68)
+        exit(0)
+    base = None
+    if len(args) > 1 and args[0] == '--snapshot':
+        # NOTE: globals of the snapshot are the base of the globals, see GlobalEnvironment
+        try:
+            base = load_snapshot(args[1])
+        except (SnapshotError, OSError) as e:
+            print(f'ERROR: cannot load snapshot {args[1]}: {e}')
+            exit(68)
+        args = args[2:]
+    lang = Lang(base=base)
+    if len(args) > 1:
+        print("ERROR: USAGE 'main.py [--snapshot <snapshot>] <source file>' or 'main.py --save-snapshot <snapshot> <source file>' "
+              "or 'main.py --batch <source files or @manifest>' or 'main.py --serve <socket>'")
         exit(69)
-    elif len(sys.argv) == 2:
-        source_file = sys.argv[1]
+    elif len(args) == 1:
+        source_file = args[0]
         lang.run_file(source_file)
     else:
         lang.run_prompt()
-
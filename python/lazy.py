@@ -0,0 +1,56 @@
+import threading
+from tokens import Token, TokenKind
+from common import ErrorHandler, RunTimeError
+from expr import FunctionExpr
+from stmt import FunctionStmt
+from parser import Parser
+from resolver import Resolver
+from typeinferrer import TypeInferrer
+from loopoptimizer import LoopOptimizer
+from fuser import Fuser
+
+# NOTE: Program is shared by threads (see Program.run), the first call of a lazy function
+# compiles its body into the shared AST, so only one thread compiles it
+LOCK = threading.Lock()
+
+class BodyErrors:
+    # Error flags of compiled body, see ErrorHandler
+    def __init__(self):
+        self.had_error = False
+        self.had_runtime_error = False
+
+def compile_lazy(function, out):
+    # Parses, resolves and optimizes body of lazy function (see LazyBody) as Lang.compile
+    # does (except inlining), errors are reported to out and raised as RunTimeError
+    with LOCK:
+        # NOTE: other thread may have compiled it while this one waited
+        if function.lazy is not None:
+            compile_body(function, out)
+
+def compile_body(function, out):
+    lazy = function.lazy
+    errors = BodyErrors()
+    eh = ErrorHandler(errors, out)
+    last = lazy.tokens[-1]
+    tokens = lazy.tokens + [Token(TokenKind.EOF, '', None, last.line)]
+    body = Parser(tokens, eh).parse()
+    if errors.had_error:
+        raise RunTimeError(lazy.name, f'Body of {lazy.name.lexeme} has errors')
+    # NOTE: compiled into a new FunctionExpr, function with errors stays lazy
+    compiled = FunctionExpr(function.params, body)
+    resolver = Resolver(eh, False)
+    resolver.resolve_lazy(compiled, lazy)
+    if errors.had_error:
+        raise RunTimeError(lazy.name, f'Body of {lazy.name.lexeme} has errors')
+    stmts = [FunctionStmt(lazy.name, compiled)]
+    infer_types, loop_opt, fuse = lazy.passes
+    if infer_types == 1:
+        TypeInferrer(resolver.bindings).infer(stmts)
+    if loop_opt == 1:
+        LoopOptimizer(resolver.bindings).optimize(stmts)
+    if fuse == 1:
+        Fuser().fuse(stmts)
+    # NOTE: lazy is cleared last, a function which is not lazy always has its body
+    function.captures = compiled.captures
+    function.body = compiled.body
+    function.lazy = None
@@ -25,7 +25,12 @@ class Lexer:
             'true': TokenKind.TRUE,
             'var': TokenKind.VAR,
             'while': TokenKind.WHILE,
-            'break': TokenKind.BREAK
+            'break': TokenKind.BREAK,
+            'in': TokenKind.IN,
+            'yield': TokenKind.YIELD,
+            'async': TokenKind.ASYNC,
+            'await': TokenKind.AWAIT,
+            'import': TokenKind.IMPORT
         }
 
     def tokenize(self):
@@ -0,0 +1,250 @@
+import math
+from array import array
+from common import NativeError, stringify
+from natives import NativeFunction, NativeObject, module, check_number, check_integer, check_index, check_callable, iterate
+
+def check_range(name, start, end, length):
+    # NOTE: slice bounds are clamped to the list, like substring
+    check_integer(name, start, end)
+    return min(max(int(start), 0), length), min(max(int(end), 0), length)
+
+def check_sortable(name, items):
+    if all([isinstance(item, float) for item in items]) or all([isinstance(item, str) for item in items]):
+        return
+    raise NativeError(f'{name}: only numbers or only strings can be sorted')
+
+class List(NativeObject):
+    # Dynamic array of any values, with O(1) indexed get and set
+    def __init__(self, items=None):
+        super().__init__()
+        self.items = [] if items is None else items
+
+    def __str__(self):
+        return '[' + ', '.join([stringify(item) for item in self.items]) + ']'
+
+    def iterate(self):
+        return iter(self.items)
+
+    def get_item(self, interpreter, index):
+        return self.items[check_index('get', index, len(self.items))]
+
+    def set_item(self, interpreter, index, value):
+        self.items[check_index('set', index, len(self.items))] = value
+        return value
+
+    def append(self, interpreter, value):
+        self.items.append(value)
+        return None
+
+    def extend(self, interpreter, iterable):
+        iterator = iterate(iterable)
+        if iterator is None:
+            raise NativeError('extend: argument must be iterable')
+        self.items.extend(iterator)
+        return None
+
+    def pop(self, interpreter):
+        if len(self.items) == 0:
+            raise NativeError('pop: list is empty')
+        return self.items.pop()
+
+    def length(self, interpreter):
+        return float(len(self.items))
+
+    def slice(self, interpreter, start, end):
+        start, end = check_range('slice', start, end, len(self.items))
+        return List(self.items[start:end])
+
+    def index_of(self, interpreter, value):
+        for i, item in enumerate(self.items):
+            if interpreter.is_equal(item, value):
+                return float(i)
+        return -1.0
+
+    def sum(self, interpreter):
+        check_number('sum', *self.items)
+        return float(sum(self.items))
+
+    def min(self, interpreter):
+        check_number('min', *self.items)
+        if len(self.items) == 0:
+            return None
+        return min(self.items)
+
+    def max(self, interpreter):
+        check_number('max', *self.items)
+        if len(self.items) == 0:
+            return None
+        return max(self.items)
+
+    def sort(self, interpreter):
+        check_sortable('sort', self.items)
+        self.items.sort()
+        return None
+
+    def reverse(self, interpreter):
+        self.items.reverse()
+        return None
+
+    def map(self, interpreter, fn):
+        check_callable('map', fn, 1)
+        return List([fn.call(interpreter, [item]) for item in self.items])
+
+    def filter(self, interpreter, fn):
+        check_callable('filter', fn, 1)
+        return List([item for item in self.items if interpreter.is_truthy(fn.call(interpreter, [item]))])
+
+    def fill(self, interpreter, value):
+        self.items[:] = [value] * len(self.items)
+        return None
+
+    methods = {
+        'get': (1, get_item),
+        'set': (2, set_item),
+        'append': (1, append),
+        'extend': (1, extend),
+        'pop': (0, pop),
+        'length': (0, length),
+        'slice': (2, slice),
+        'indexOf': (1, index_of),
+        'sum': (0, sum),
+        'min': (0, min),
+        'max': (0, max),
+        'sort': (0, sort),
+        'reverse': (0, reverse),
+        'map': (1, map),
+        'filter': (1, filter),
+        'fill': (1, fill),
+    }
+
+class FloatArray(NativeObject):
+    # Array of numbers stored unboxed in array('d'),
+    # bulk operations (sum, min, max, sort, fill) run without boxing every element
+    def __init__(self, values):
+        super().__init__()
+        self.values = values
+
+    def __str__(self):
+        return '[' + ', '.join([stringify(value) for value in self.values]) + ']'
+
+    def iterate(self):
+        return iter(self.values)
+
+    def get_item(self, interpreter, index):
+        return self.values[check_index('get', index, len(self.values))]
+
+    def set_item(self, interpreter, index, value):
+        check_number('set', value)
+        self.values[check_index('set', index, len(self.values))] = value
+        return value
+
+    def append(self, interpreter, value):
+        check_number('append', value)
+        self.values.append(value)
+        return None
+
+    def pop(self, interpreter):
+        if len(self.values) == 0:
+            raise NativeError('pop: array is empty')
+        return self.values.pop()
+
+    def length(self, interpreter):
+        return float(len(self.values))
+
+    def slice(self, interpreter, start, end):
+        start, end = check_range('slice', start, end, len(self.values))
+        return FloatArray(self.values[start:end])
+
+    def sum(self, interpreter):
+        return float(sum(self.values))
+
+    def min(self, interpreter):
+        if len(self.values) == 0:
+            return None
+        return min(self.values)
+
+    def max(self, interpreter):
+        if len(self.values) == 0:
+            return None
+        return max(self.values)
+
+    def sort(self, interpreter):
+        self.values[:] = array('d', sorted(self.values))
+        return None
+
+    def map(self, interpreter, fn):
+        check_callable('map', fn, 1)
+        values = array('d')
+        for value in self.values:
+            value = fn.call(interpreter, [value])
+            check_number('map', value)
+            values.append(value)
+        return FloatArray(values)
+
+    def fill(self, interpreter, value):
+        check_number('fill', value)
+        self.values[:] = array('d', [value]) * len(self.values)
+        return None
+
+    methods = {
+        'get': (1, get_item),
+        'set': (2, set_item),
+        'append': (1, append),
+        'pop': (0, pop),
+        'length': (0, length),
+        'slice': (2, slice),
+        'sum': (0, sum),
+        'min': (0, min),
+        'max': (0, max),
+        'sort': (0, sort),
+        'map': (1, map),
+        'fill': (1, fill),
+    }
+
+class Range(NativeObject):
+    # Lazy sequence start, start + step, ... up to end (excluded)
+    def __init__(self, start, end, step):
+        super().__init__()
+        self.start = start
+        self.end = end
+        self.step = step
+
+    def __str__(self):
+        return f'range({stringify(self.start)}, {stringify(self.end)}, {stringify(self.step)})'
+
+    def iterate(self):
+        start, end, step = self.start, self.end, self.step
+        if start.is_integer() and end.is_integer() and step.is_integer():
+            # NOTE: Python range iterates integers without any Python code per element
+            return map(float, range(int(start), int(end), int(step)))
+        return (start + i * step for i in range(self.count()))
+
+    def count(self):
+        return max(math.ceil((self.end - self.start) / self.step), 0)
+
+    def length(self, interpreter):
+        return float(self.count())
+
+    methods = {
+        'length': (0, length),
+    }
+
+def new_range(start, end, step):
+    check_number('range', start, end, step)
+    if step == 0:
+        raise NativeError('range: step must not be zero')
+    if not all([math.isfinite(value) for value in (start, end, step)]):
+        raise NativeError('range: arguments must be finite')
+    return Range(start, end, step)
+
+def new_float_array(size):
+    check_integer('FloatArray', size)
+    if size < 0:
+        raise NativeError('FloatArray: size must not be negative')
+    return FloatArray(array('d', bytes(8 * int(size))))
+
+module('collections', [
+    NativeFunction('List', 0, List, False),
+    NativeFunction('FloatArray', 1, new_float_array, False),
+    NativeFunction('range', 3, new_range, False),
+])
@@ -0,0 +1,340 @@
+from common import Visitor, Walker, RunTimeError
+from tokens import Token, TokenKind
+from expr import *
+from stmt import *
+
+class LoopInfo(Walker):
+    # What may change while the loop runs
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.assigned = set()
+        self.assigned_globals = set()
+        self.declared = set()
+        self.has_calls = False
+        self.has_sets = False
+
+    def scan(self, loop):
+        if isinstance(loop, ForInStmt):
+            # NOTE: iterable is evaluated once, before the loop
+            self.declare(loop.name)
+        else:
+            self.walk_expr(loop.condition)
+        self.walk([loop.body])
+        return self
+
+    def visit_for_in_stmt(self, stmt):
+        self.declare(stmt.name)
+        super().visit_for_in_stmt(stmt)
+
+    def visit_yield_stmt(self, stmt):
+        # NOTE: code outside of the generator runs while it is suspended
+        self.has_calls = True
+        super().visit_yield_stmt(stmt)
+
+    def visit_await_expr(self, expr):
+        # NOTE: other coroutines run while this one awaits
+        self.has_calls = True
+        super().visit_await_expr(expr)
+
+    def declare(self, name):
+        variable = self.bindings.get(name)
+        if variable is not None:
+            self.declared.add(variable)
+
+    def visit_class_stmt(self, stmt):
+        self.declare(stmt.name)
+        super().visit_class_stmt(stmt)
+
+    def visit_function_stmt(self, stmt):
+        self.declare(stmt.name)
+        super().visit_function_stmt(stmt)
+
+    def visit_var_stmt(self, stmt):
+        self.declare(stmt.name)
+        super().visit_var_stmt(stmt)
+
+    def visit_import_stmt(self, stmt):
+        # NOTE: first import runs the module
+        self.has_calls = True
+        self.declare(stmt.name)
+        if self.bindings.get(stmt.name) is None:
+            self.assigned_globals.add(stmt.name.lexeme)
+
+    def visit_set_expr(self, expr):
+        self.has_sets = True
+        super().visit_set_expr(expr)
+
+    def visit_call_expr(self, expr):
+        self.has_calls = True
+        super().visit_call_expr(expr)
+
+    def visit_assign_expr(self, expr):
+        variable = self.bindings.get(expr)
+        if variable is None:
+            self.assigned_globals.add(expr.name.lexeme)
+        else:
+            self.assigned.add(variable)
+        super().visit_assign_expr(expr)
+
+class LoopOptimizer(Visitor):
+    # Optimizes loops (WhileStmt, so desugared for loops too, and ForInStmt):
+    #   - loop invariant expressions, e.g. `this.n * 2` or `"a" + b`, are wrapped
+    #     in InvariantExpr, which is evaluated once per loop execution,
+    #   - constant expressions are folded, e.g. `60 * 60` -> `3600`,
+    #   - division by power of two is replaced by (exact) multiplication,
+    #     `x * 1` with `x` proven number is replaced by `x`.
+    # Expression is invariant when it has no side effects and nothing it reads
+    # is assigned in the loop: locals captured by closures, globals and fields
+    # are invariant only in loops without calls (and without sets for fields).
+    # NOTE: must run after Resolver (it uses its bindings) and TypeInferrer.
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.loop = None
+        self.hoisted = 0
+        self.folded = 0
+
+    def optimize(self, stmts):
+        for i in range(len(stmts)):
+            stmts[i] = self.optimize_stmt(stmts[i])
+        return stmts
+
+    def optimize_stmt(self, stmt):
+        if stmt is None:
+            return None
+        return stmt.accept(self)
+
+    def optimize_expr(self, expr):
+        expr = expr.accept(self)
+        if self.loop is None:
+            return expr
+        return self.hoist(expr)
+
+    def hoist(self, expr):
+        # Wraps the largest invariant operations, operands of operations
+        # are folded without hoisting (see fold), so they are hoisted here
+        if not self.is_operation(expr):
+            return expr
+        if self.is_invariant(expr):
+            invariant = InvariantExpr(expr)
+            self.loop.invariants.append(invariant)
+            self.hoisted += 1
+            return invariant
+        if isinstance(expr, GroupingExpr):
+            expr.expression = self.hoist(expr.expression)
+        elif isinstance(expr, UnaryExpr):
+            expr.right = self.hoist(expr.right)
+        else:
+            expr.left = self.hoist(expr.left)
+            expr.right = self.hoist(expr.right)
+        return expr
+
+    # Invariants
+    def is_operation(self, expr):
+        if isinstance(expr, GroupingExpr):
+            return self.is_operation(expr.expression)
+        return isinstance(expr, (BinaryExpr, UnaryExpr, LogicalExpr))
+
+    def is_invariant(self, expr):
+        info = self.loop_info
+        if isinstance(expr, (LiteralExpr, ThisExpr, InvariantExpr)):
+            return True
+        if isinstance(expr, VariableExpr):
+            variable = self.bindings.get(expr)
+            if variable is None:
+                return expr.name.lexeme not in info.assigned_globals and not info.has_calls
+            if variable in info.assigned or variable in info.declared:
+                return False
+            return not variable.captured or not info.has_calls
+        if isinstance(expr, GetExpr):
+            return not info.has_calls and not info.has_sets and self.is_invariant(expr.object)
+        if isinstance(expr, GroupingExpr):
+            return self.is_invariant(expr.expression)
+        if isinstance(expr, UnaryExpr):
+            return self.is_invariant(expr.right)
+        if isinstance(expr, (BinaryExpr, LogicalExpr)):
+            return self.is_invariant(expr.left) and self.is_invariant(expr.right)
+        return False
+
+    def optimize_function(self, function):
+        # NOTE: function body runs when function is called, not in the loop
+        loop, self.loop = self.loop, None
+        self.optimize(function.body)
+        self.loop = loop
+
+    # Statements
+    def visit_class_stmt(self, stmt):
+        for method in stmt.methods:
+            self.optimize_function(method.function)
+        return stmt
+
+    def visit_function_stmt(self, stmt):
+        self.optimize_function(stmt.function)
+        return stmt
+
+    def visit_if_stmt(self, stmt):
+        stmt.condition = self.optimize_expr(stmt.condition)
+        stmt.then_branch = self.optimize_stmt(stmt.then_branch)
+        stmt.else_branch = self.optimize_stmt(stmt.else_branch)
+        return stmt
+
+    def visit_var_stmt(self, stmt):
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimize_expr(stmt.initializer)
+        return stmt
+
+    def visit_expression_stmt(self, stmt):
+        stmt.expr = self.optimize_expr(stmt.expr)
+        return stmt
+
+    def visit_print_stmt(self, stmt):
+        stmt.expr = self.optimize_expr(stmt.expr)
+        return stmt
+
+    def visit_return_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.optimize_expr(stmt.value)
+        return stmt
+
+    def visit_while_stmt(self, stmt):
+        # Outer loop hoists first, inner loop sees its invariants as InvariantExpr
+        enclosing = (self.loop, getattr(self, 'loop_info', None))
+        if stmt.yields:
+            # NOTE: loop with `yield` is run by GeneratorExecutor, which does not evaluate
+            # invariants, loops nested in it hoist into themselves
+            self.optimize_loop(stmt, None, None)
+            self.loop, self.loop_info = enclosing
+            return stmt
+        if enclosing[0] is not None:
+            self.optimize_loop(stmt, enclosing[0], enclosing[1])
+        self.loop = stmt
+        self.loop_info = LoopInfo(self.bindings).scan(stmt)
+        self.optimize_loop(stmt, stmt, self.loop_info)
+        self.loop, self.loop_info = enclosing
+        return stmt
+
+    def visit_for_in_stmt(self, stmt):
+        stmt.iterable = self.optimize_expr(stmt.iterable)
+        return self.visit_while_stmt(stmt)
+
+    def optimize_loop(self, stmt, loop, info):
+        self.loop, self.loop_info = loop, info
+        if not isinstance(stmt, ForInStmt):
+            stmt.condition = self.optimize_expr(stmt.condition)
+        stmt.body = self.optimize_stmt(stmt.body)
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.optimize_expr(stmt.value)
+        return stmt
+
+    def visit_import_stmt(self, stmt):
+        return stmt
+
+    def visit_block_stmt(self, stmt):
+        self.optimize(stmt.stmts)
+        return stmt
+
+    def visit_break_stmt(self, stmt):
+        return stmt
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        return expr
+
+    def visit_this_expr(self, expr):
+        return expr
+
+    def visit_get_expr(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        return expr
+
+    def visit_set_expr(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_function_expr(self, expr):
+        self.optimize_function(expr)
+        return expr
+
+    def visit_logical_expr(self, expr):
+        expr.left = self.fold(expr.left)
+        expr.right = self.fold(expr.right)
+        return expr
+
+    def visit_call_expr(self, expr):
+        expr.callee = self.optimize_expr(expr.callee)
+        expr.arguments = [self.optimize_expr(arg) for arg in expr.arguments]
+        return expr
+
+    def visit_variable_expr(self, expr):
+        return expr
+
+    def visit_assign_expr(self, expr):
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_binary_expr(self, expr):
+        expr.left = self.fold(expr.left)
+        expr.right = self.fold(expr.right)
+        if isinstance(expr.left, LiteralExpr) and isinstance(expr.right, LiteralExpr):
+            return self.constant(expr)
+        right = expr.right
+        if expr.operator.kind == TokenKind.SLASH and isinstance(right, LiteralExpr) and self.is_power_of_two(right.value):
+            # NOTE: x / 2^k == x * 2^-k exactly, and error message for non numbers is the same
+            star = Token(TokenKind.STAR, '*', None, expr.operator.line)
+            multiplication = BinaryExpr(expr.left, star, LiteralExpr(1 / right.value))
+            multiplication.numeric = expr.numeric
+            self.folded += 1
+            return multiplication
+        if expr.operator.kind == TokenKind.STAR and expr.numeric and isinstance(right, LiteralExpr) and right.value == 1:
+            self.folded += 1
+            return expr.left
+        return expr
+
+    def visit_grouping_expr(self, expr):
+        expr.expression = self.fold(expr.expression)
+        if isinstance(expr.expression, LiteralExpr):
+            return expr.expression
+        return expr
+
+    def visit_literal_expr(self, expr):
+        return expr
+
+    def visit_unary_expr(self, expr):
+        expr.right = self.fold(expr.right)
+        if isinstance(expr.right, LiteralExpr):
+            return self.constant(expr)
+        return expr
+
+    def visit_invariant_expr(self, expr):
+        # NOTE: already hoisted out of an enclosing loop
+        return expr
+
+    def visit_await_expr(self, expr):
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def fold(self, expr):
+        # NOTE: operands of operations are hoisted by the outermost operation
+        loop, self.loop = self.loop, None
+        expr = self.optimize_expr(expr)
+        self.loop = loop
+        return expr
+
+    def constant(self, expr):
+        # Interpreter evaluates constant expression, so folding has exactly its semantics,
+        # expression which fails (e.g. division by zero) is kept to fail at runtime
+        from interpreter import Interpreter
+        try:
+            value = Interpreter().evaluate(expr)
+        except RunTimeError:
+            return expr
+        self.folded += 1
+        return LiteralExpr(value)
+
+    def is_power_of_two(self, value):
+        if not isinstance(value, float) or value < 2 or value > 2 ** 64 or value != int(value):
+            return False
+        n = int(value)
+        return n & (n - 1) == 0
@@ -0,0 +1,70 @@
+import math
+from common import NativeError, stringify
+from natives import NativeFunction, NativeObject, module
+from lists import List
+
+def check_key(name, key):
+    # NOTE: Python dict uses `==` like Interpreter.is_equal, so 1 and true are the same key,
+    # NaN is rejected, it is not equal to itself
+    if key is not None and not isinstance(key, (float, str, bool)):
+        raise NativeError(f'{name}: key must be a number, string, bool or nil')
+    if isinstance(key, float) and math.isnan(key):
+        raise NativeError(f'{name}: key must not be NaN')
+    return key
+
+class Map(NativeObject):
+    # Hash map with number, string, bool and nil keys, keeps insertion order
+    def __init__(self, entries=None):
+        super().__init__()
+        self.entries = {} if entries is None else entries
+
+    def __str__(self):
+        return '{' + ', '.join([f'{stringify(k)}: {stringify(v)}' for k, v in self.entries.items()]) + '}'
+
+    def iterate(self):
+        # NOTE: keys are copied, so the loop body can change the map
+        return iter(list(self.entries))
+
+    def get_value(self, interpreter, key):
+        return self.entries.get(check_key('get', key))
+
+    def set_value(self, interpreter, key, value):
+        self.entries[check_key('set', key)] = value
+        return value
+
+    def has(self, interpreter, key):
+        return check_key('has', key) in self.entries
+
+    def delete(self, interpreter, key):
+        return self.entries.pop(check_key('delete', key), MISSING) is not MISSING
+
+    def size(self, interpreter):
+        return float(len(self.entries))
+
+    def keys(self, interpreter):
+        return List(list(self.entries.keys()))
+
+    def values(self, interpreter):
+        return List(list(self.entries.values()))
+
+    def clear(self, interpreter):
+        self.entries.clear()
+        return None
+
+    methods = {
+        'get': (1, get_value),
+        'set': (2, set_value),
+        'has': (1, has),
+        'delete': (1, delete),
+        'size': (0, size),
+        'keys': (0, keys),
+        'values': (0, values),
+        'clear': (0, clear),
+    }
+
+# NOTE: nil is a valid value, so missing entries need their own marker
+MISSING = object()
+
+module('collections', [
+    NativeFunction('Map', 0, Map, False),
+])
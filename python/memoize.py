@@ -0,0 +1,109 @@
+import math
+from collections import OrderedDict
+from common import NativeError
+from function import LangCallable
+from purity import PurityChecker
+
+# NOTE: cache size used by `memoize(fn, nil)`
+MEMO_SIZE = 1024
+
+class MemoizedFunction(LangCallable):
+    # Pure function with LRU cache of its results.
+    # Only calls with number, string, bool and nil arguments are cached,
+    # argument type is a part of the key, so `1` and `true` are different keys,
+    # and so is the sign of zero, `0` and `-0` are equal but print differently.
+    def __init__(self, function, size, reads):
+        self.function = function
+        self.size = size
+        # NOTE: non-local functions read by the function when it was checked (see PurityChecker),
+        # assigning any of them may make it impure, or change its results
+        self.reads = reads
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # NOTE: memoized function is pure too, so it can be used by other memoized functions
+        self.pure = True
+
+    def __str__(self):
+        return f'<memoized {self.function}>'
+
+    def is_pure(self, interpreter):
+        # True when the function is still pure, it is checked again when a function
+        # it reads was assigned, results cached before are dropped then
+        for env, name, value in self.reads:
+            if env.get_value(name) is not value:
+                break
+        else:
+            return True
+        checker = PurityChecker(interpreter)
+        if checker.reason(self.function) is not None:
+            # NOTE: calls are not cached while it is impure, it is checked on every call
+            return False
+        self.reads = checker.reads
+        self.cache.clear()
+        return True
+
+    def call(self, interpreter, arguments):
+        if not self.is_pure(interpreter):
+            return self.function.call(interpreter, arguments)
+        key = []
+        for arg in arguments:
+            if arg is not None and not isinstance(arg, (float, str, bool)):
+                return self.function.call(interpreter, arguments)
+            if arg == 0 and isinstance(arg, float):
+                key.append((float, arg, math.copysign(1.0, arg)))
+            else:
+                key.append((type(arg), arg))
+        key = tuple(key)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        self.misses += 1
+        value = self.function.call(interpreter, arguments)
+        self.cache[key] = value
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def arity(self):
+        return self.function.arity()
+
+    def stats(self):
+        return f'hits: {self.hits}, misses: {self.misses}, evictions: {self.evictions}, size: {len(self.cache)}/{self.size}'
+
+class Memoize(LangCallable):
+    # memoize(fn, size) -> fn with cached results, size nil means MEMO_SIZE
+    def __str__(self):
+        return '<native function>'
+
+    def call(self, interpreter, arguments):
+        function, size = arguments
+        if size is None:
+            size = MEMO_SIZE
+        elif not isinstance(size, float) or size < 1 or size != int(size):
+            raise NativeError('Cache size must be a positive integer')
+        checker = PurityChecker(interpreter)
+        reason = checker.reason(function)
+        if reason is not None:
+            raise NativeError(f'Cannot memoize {function}: {reason}')
+        return MemoizedFunction(function, int(size), checker.reads)
+
+    def arity(self):
+        return 2
+
+class MemoStats(LangCallable):
+    # memoStats(fn) -> cache statistics of memoized fn
+    def __str__(self):
+        return '<native function>'
+
+    def call(self, interpreter, arguments):
+        function = arguments[0]
+        if not isinstance(function, MemoizedFunction):
+            raise NativeError(f'{function} is not memoized')
+        return function.stats()
+
+    def arity(self):
+        return 1
@@ -0,0 +1,179 @@
+import io
+import os
+import glob
+import pickle
+import hashlib
+from common import RunTimeError, GlobalEnvironment, Walker
+from natives import NativeObject
+
+# NOTE: directory of compiled modules (by hash of their source and compile options),
+# empty means that modules are compiled every time the process imports them
+MODULE_CACHE = os.getenv('LANGCACHE') or ''
+# NOTE: compiled module keeps AST nodes as they are, so the key changes with the interpreter,
+# it is the hash of the interpreter sources, computed when the cache is used the first time
+INTERPRETER_HASH = None
+
+# Compiled modules of this process, by absolute path: (hash of source, compile options, program).
+# Running does not change a program (see Program), so interpreters of all runs (e.g. --batch
+# jobs, Program.run) share it, only globals of the module are created per interpreter.
+# NOTE: only the last version of a file is kept, a long running process sees changes
+COMPILED = {}
+
+def interpreter_hash():
+    global INTERPRETER_HASH
+    if INTERPRETER_HASH is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        INTERPRETER_HASH = digest.hexdigest()
+    return INTERPRETER_HASH
+
+class LangModule(NativeObject):
+    # Module loaded by `import`, its globals are its properties,
+    # e.g. `import "lib/math.lang"; print math.square(2);`
+    def __init__(self, name, path, globals):
+        super().__init__()
+        self.name = name
+        self.path = path
+        self.globals = globals
+        # NOTE: True while the module runs, importing it then is a cycle
+        self.loading = True
+
+    def __str__(self):
+        return f'<module {self.name}>'
+
+    def get(self, name):
+        # NOTE: only globals defined by the module, not natives
+        if name.lexeme not in self.globals.values:
+            raise RunTimeError(name, f'Module {self.name} has no {name.lexeme}')
+        return self.globals.values[name.lexeme]
+
+def cache_key(source, options):
+    text = f'{interpreter_hash()} {options}\n{source}'
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def read_cached(key):
+    try:
+        with open(os.path.join(MODULE_CACHE, key + '.langc'), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        return None
+
+def write_cached(key, program):
+    # NOTE: cache is only an optimization, module which cannot be cached is compiled again
+    path = os.path.join(MODULE_CACHE, key + '.langc')
+    temp = f'{path}.{os.getpid()}'
+    try:
+        os.makedirs(MODULE_CACHE, exist_ok=True)
+        with open(temp, 'wb') as f:
+            pickle.dump(program, f, pickle.HIGHEST_PROTOCOL)
+        # NOTE: other processes see the whole file or nothing
+        os.replace(temp, path)
+    except (OSError, pickle.PicklingError, RecursionError):
+        if os.path.exists(temp):
+            os.remove(temp)
+
+def compile_source(compiler, source):
+    # (program, errors) of the module, it is compiled by its own Lang,
+    # so its errors are not errors of the importing program
+    errors = io.StringIO()
+    program = compiler(errors).compile(source)
+    return program, errors.getvalue()
+
+def compile_module(compiler, source):
+    # (program, errors) of the module, program is from the cache when it has the same source,
+    # None when it has errors
+    if MODULE_CACHE == '':
+        return compile_source(compiler, source)
+    key = cache_key(source, compiler.options)
+    program = read_cached(key)
+    if program is not None:
+        return program, ''
+    program, errors = compile_source(compiler, source)
+    if program is not None:
+        write_cached(key, program)
+    return program, errors
+
+def load_program(compiler, path, source):
+    # (program, errors) of the module file, compiled once per process
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    entry = COMPILED.get(path)
+    if entry is not None and entry[0] == digest and entry[1] == compiler.options:
+        return entry[2], ''
+    program, errors = compile_module(compiler, source)
+    if program is not None:
+        COMPILED[path] = (digest, compiler.options, program)
+    return program, errors
+
+class Imports(Walker):
+    # Import statements of a program, also in bodies of functions
+    def __init__(self):
+        self.imports = []
+
+    def visit_import_stmt(self, stmt):
+        self.imports.append(stmt)
+
+def preload(compiler, program, directory, loaded=None):
+    # Compiles modules imported by the program (and by them) into COMPILED, without running
+    # them, e.g. --serve compiles them before it forks, so every request finds them compiled.
+    # NOTE: errors are reported when the module is imported
+    loaded = set() if loaded is None else loaded
+    finder = Imports()
+    finder.walk(program.stmts)
+    for stmt in finder.imports:
+        path = os.path.abspath(os.path.join(directory or '', stmt.path))
+        if path in loaded:
+            continue
+        loaded.add(path)
+        try:
+            with open(path, 'r') as f:
+                source = f.read()
+        except OSError:
+            continue
+        module, _ = load_program(compiler, path, source)
+        if module is not None:
+            preload(compiler, module, os.path.dirname(path), loaded)
+
+def import_module(interpreter, stmt):
+    # Module of the import statement, it is loaded (and run) the first time
+    # the interpreter imports it, see Interpreter.modules
+    # NOTE: relative to the file of the running code, also in functions of modules
+    directory = interpreter.globals.directory
+    if directory is None:
+        directory = interpreter.directory
+    path = os.path.abspath(os.path.join(directory or '', stmt.path))
+    module = interpreter.modules.get(path)
+    if module is not None:
+        if module.loading:
+            raise RunTimeError(stmt.keyword, f'Import cycle, {stmt.path} is being loaded')
+        return module
+    if interpreter.compiler is None:
+        raise RunTimeError(stmt.keyword, 'Modules cannot be imported here')
+    try:
+        with open(path, 'r') as f:
+            source = f.read()
+    except OSError:
+        raise RunTimeError(stmt.keyword, f'Cannot open module {stmt.path}')
+    program, errors = load_program(interpreter.compiler, path, source)
+    if program is None:
+        raise RunTimeError(stmt.keyword, f'Module {stmt.path} has errors\n{errors.rstrip()}')
+    from interpreter import NATIVES
+    # NOTE: module is named by its file, whatever name the first import gives it
+    name = os.path.splitext(os.path.basename(path))[0]
+    module = LangModule(name, path, GlobalEnvironment(NATIVES))
+    module.globals.directory = os.path.dirname(path)
+    interpreter.modules[path] = module
+    previous = (interpreter.globals, interpreter.env)
+    interpreter.globals = interpreter.env = module.globals
+    try:
+        for stmt in program.stmts:
+            interpreter.execute(stmt)
+    except BaseException:
+        # NOTE: module which failed can be imported again
+        del interpreter.modules[path]
+        raise
+    finally:
+        interpreter.globals, interpreter.env = previous
+    module.loading = False
+    return module
@@ -0,0 +1,251 @@
+import math
+import types
+import random
+import time
+from common import RunTimeError, NativeError, format_number, stringify
+from function import LangCallable
+
+class NativeFunction(LangCallable):
+    # Function implemented in Python, it gets the evaluated arguments as they are
+    # and, unlike LangFunction, needs no environment for the call.
+    # Pure natives (result depends only on arguments, no effects) can be used by
+    # memoized functions, see PurityChecker.
+    def __init__(self, name, arity, fn, pure=True):
+        self.name = name
+        self.params = arity
+        self.fn = fn
+        self.pure = pure
+
+    def __str__(self):
+        return f'<native fn {self.name}>'
+
+    def call(self, interpreter, arguments):
+        try:
+            return self.fn(*arguments)
+        except (ValueError, OverflowError, ZeroDivisionError) as e:
+            # NOTE: e.g. math domain errors
+            raise NativeError(f'{self.name}: {e}')
+
+    def arity(self):
+        return self.params
+
+class NativeMethod(LangCallable):
+    # Method of NativeObject bound to the object, fn gets (object, interpreter, *arguments)
+    def __init__(self, obj, name, arity, fn):
+        self.obj = obj
+        self.name = name
+        self.params = arity
+        self.fn = fn
+
+    def __str__(self):
+        return f'<native method {self.name}>'
+
+    def call(self, interpreter, arguments):
+        try:
+            return self.fn(self.obj, interpreter, *arguments)
+        except (ValueError, OverflowError, ZeroDivisionError) as e:
+            raise NativeError(f'{self.name}: {e}')
+
+    def arity(self):
+        return self.params
+
+class NativeObject:
+    # Object implemented in Python, e.g. List. Subclasses declare their
+    # methods as {name: (arity, function)}, bound methods are created once per object.
+    methods = {}
+
+    def __init__(self):
+        self.bound = {}
+
+    def iterate(self):
+        # Python iterator used by for-in loop, None when object is not iterable
+        return None
+
+    def get(self, name):
+        method = self.bound.get(name.lexeme)
+        if method is None:
+            if name.lexeme not in self.methods:
+                raise RunTimeError(name, f'Undefined property {name.lexeme}')
+            arity, fn = self.methods[name.lexeme]
+            method = NativeMethod(self, name.lexeme, arity, fn)
+            self.bound[name.lexeme] = method
+        return method
+
+def iterate(value):
+    # Python iterator over values of Lang iterable, None when value is not iterable
+    if isinstance(value, NativeObject):
+        return value.iterate()
+    if isinstance(value, str):
+        return iter(value)
+    return None
+
+def close_iterator(iterator):
+    # Called when for-in loop ends, also early (break, return or error), so native
+    # iterators release what they hold, e.g. open file, without waiting for the GC
+    # NOTE: only Python generators, Lang generator can be used after the loop
+    if isinstance(iterator, types.GeneratorType):
+        iterator.close()
+
+# Module name -> {global name -> value}, see register
+MODULES = {}
+
+def module(name, natives, constants=None):
+    # NOTE: module can be defined by several files, e.g. collections
+    values = MODULES.setdefault(name, {})
+    values.update({native.name: native for native in natives})
+    values.update(constants or {})
+
+# Functions called when the program ends, e.g. to close files, see cleanup
+CLEANUPS = []
+
+def cleanup():
+    for fn in CLEANUPS:
+        fn()
+
+def register(env, modules=None):
+    # Defines natives of the modules (all by default) as globals
+    for name in modules or MODULES:
+        for key, value in MODULES[name].items():
+            env.define(key, value)
+
+# Argument checks
+def check_number(name, *values):
+    for value in values:
+        if not isinstance(value, float):
+            raise NativeError(f'{name}: argument must be a number')
+
+def check_integer(name, *values):
+    check_number(name, *values)
+    for value in values:
+        if value != int(value):
+            raise NativeError(f'{name}: argument must be an integer')
+
+def check_index(name, index, length):
+    check_integer(name, index)
+    if index < 0 or index >= length:
+        raise NativeError(f'{name}: index {format_number(index)} out of range')
+    return int(index)
+
+def check_callable(name, fn, arity):
+    if not isinstance(fn, LangCallable) or fn.arity() != arity:
+        raise NativeError(f'{name}: argument must be a function of {arity} parameters')
+
+def check_string(name, *values):
+    for value in values:
+        if not isinstance(value, str):
+            raise NativeError(f'{name}: argument must be a string')
+
+# Math
+def number_fn(name, fn):
+    def native(*args):
+        check_number(name, *args)
+        return float(fn(*args))
+    return native
+
+def lang_round(x):
+    check_number('round', x)
+    # NOTE: halves are rounded up, Python rounds them to even
+    return float(math.floor(x + 0.5))
+
+module('math', [
+    NativeFunction('sqrt', 1, number_fn('sqrt', math.sqrt)),
+    NativeFunction('floor', 1, number_fn('floor', math.floor)),
+    NativeFunction('ceil', 1, number_fn('ceil', math.ceil)),
+    NativeFunction('round', 1, lang_round),
+    NativeFunction('abs', 1, number_fn('abs', abs)),
+    NativeFunction('min', 2, number_fn('min', min)),
+    NativeFunction('max', 2, number_fn('max', max)),
+    NativeFunction('pow', 2, number_fn('pow', math.pow)),
+    NativeFunction('exp', 1, number_fn('exp', math.exp)),
+    NativeFunction('log', 1, number_fn('log', math.log)),
+    NativeFunction('sin', 1, number_fn('sin', math.sin)),
+    NativeFunction('cos', 1, number_fn('cos', math.cos)),
+    NativeFunction('tan', 1, number_fn('tan', math.tan)),
+    NativeFunction('atan2', 2, number_fn('atan2', math.atan2)),
+    NativeFunction('random', 0, random.random, False),
+], {'pi': math.pi})
+
+# String
+def lang_len(s):
+    check_string('len', s)
+    return float(len(s))
+
+def substring(s, start, end):
+    check_string('substring', s)
+    check_integer('substring', start, end)
+    # NOTE: indexes are clamped to the string, like slices
+    return s[max(int(start), 0):max(int(end), 0)]
+
+def index_of(s, sub):
+    check_string('indexOf', s, sub)
+    return float(s.find(sub))
+
+def char_at(s, i):
+    check_string('charAt', s)
+    return s[check_index('charAt', i, len(s))]
+
+def char_code(s):
+    check_string('charCode', s)
+    if len(s) != 1:
+        raise NativeError('charCode: argument must be one character')
+    return float(ord(s))
+
+def from_char_code(n):
+    check_integer('fromCharCode', n)
+    return chr(int(n))
+
+def string_fn(name, fn):
+    def native(*args):
+        check_string(name, *args)
+        return fn(*args)
+    return native
+
+def lang_str(value):
+    if isinstance(value, str):
+        return value
+    return stringify(value)
+
+def lang_num(s):
+    # Parses number, returns nil when the string is not a number
+    check_string('num', s)
+    try:
+        value = float(s)
+    except ValueError:
+        return None
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return value
+
+def lang_format(x, digits):
+    check_number('format', x)
+    check_integer('format', digits)
+    if digits < 0:
+        raise NativeError('format: number of digits must not be negative')
+    return f'{x:.{int(digits)}f}'
+
+module('string', [
+    NativeFunction('len', 1, lang_len),
+    NativeFunction('substring', 3, substring),
+    NativeFunction('indexOf', 2, index_of),
+    NativeFunction('charAt', 2, char_at),
+    NativeFunction('charCode', 1, char_code),
+    NativeFunction('fromCharCode', 1, from_char_code),
+    NativeFunction('upper', 1, string_fn('upper', str.upper)),
+    NativeFunction('lower', 1, string_fn('lower', str.lower)),
+    NativeFunction('trim', 1, string_fn('trim', str.strip)),
+    NativeFunction('replace', 3, string_fn('replace', str.replace)),
+    NativeFunction('str', 1, lang_str),
+    NativeFunction('num', 1, lang_num),
+    NativeFunction('format', 2, lang_format),
+])
+
+# Time
+def sleep(seconds):
+    check_number('sleep', seconds)
+    time.sleep(max(seconds, 0))
+    return None
+
+module('time', [
+    NativeFunction('clock', 0, time.time, False),
+    NativeFunction('sleep', 1, sleep, False),
+])
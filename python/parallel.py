@@ -0,0 +1,98 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from common import RunTimeError, NativeError
+from natives import NativeFunction, module, iterate, check_integer, check_callable
+from lists import List, FloatArray
+from maps import Map
+from shared import SharedArray
+
+# NOTE: number of chunks per worker, more chunks balance uneven work better,
+# fewer chunks send fewer messages
+CHUNKS_PER_WORKER = 4
+
+# NOTE: (interpreter, function, items) of the running parallelMap, it is set before
+# worker processes are forked, so workers get the program and the items without pickling
+WORK = None
+
+def can_fork():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+def is_shareable(value):
+    # Values which can be sent back from worker process
+    if value is None or isinstance(value, (float, str, bool, FloatArray, SharedArray)):
+        return True
+    if isinstance(value, List):
+        return all([is_shareable(item) for item in value.items])
+    if isinstance(value, Map):
+        return all([is_shareable(item) for item in value.entries.values()])
+    return False
+
+def run_chunk(start, end):
+    # Runs in worker process, results of items[start:end] or the error
+    interpreter, fn, items = WORK
+    results = []
+    try:
+        for i in range(start, end):
+            result = fn.call(interpreter, [items[i]])
+            if not is_shareable(result):
+                raise NativeError('parallelMap: function must return numbers, strings, bools, nil, lists, maps or arrays')
+            results.append(result)
+    except RunTimeError as e:
+        # NOTE: RunTimeError cannot be unpickled, so its token and message are sent
+        return None, (e.token, str(e))
+    except NativeError as e:
+        return None, (None, str(e))
+    return results, None
+
+def parallel_map(interpreter, fn, items, workers):
+    global WORK
+    n = len(items)
+    chunk = max(-(-n // (workers * CHUNKS_PER_WORKER)), 1)
+    starts = range(0, n, chunk)
+    # NOTE: buffered output would be printed by every forked worker too
+    sys.stdout.flush()
+    WORK = (interpreter, fn, items)
+    try:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            chunks = list(executor.map(run_chunk, starts, [min(start + chunk, n) for start in starts]))
+    finally:
+        WORK = None
+    results = []
+    for chunk_results, error in chunks:
+        if error is not None:
+            token, message = error
+            if token is None:
+                raise NativeError(message)
+            raise RunTimeError(token, message)
+        results.extend(chunk_results)
+    return results
+
+class ParallelMap(NativeFunction):
+    # parallelMap(fn, items, workers): List of fn(item) for all items, computed by forked
+    # worker processes, every worker has the whole program, only results are sent back.
+    # Workers see the program as it is at the call, their changes of variables are lost.
+    def __init__(self):
+        super().__init__('parallelMap', 3, None, False)
+
+    def call(self, interpreter, arguments):
+        fn, items, workers = arguments
+        check_callable('parallelMap', fn, 1)
+        iterator = iterate(items)
+        if iterator is None:
+            raise NativeError('parallelMap: items must be iterable')
+        if workers is None:
+            workers = float(os.cpu_count() or 1)
+        check_integer('parallelMap', workers)
+        if workers < 1:
+            raise NativeError('parallelMap: number of workers must be at least 1')
+        items = list(iterator)
+        if workers == 1 or len(items) < 2 or not can_fork():
+            return List([fn.call(interpreter, [item]) for item in items])
+        return List(parallel_map(interpreter, fn, items, int(workers)))
+
+module('parallel', [
+    ParallelMap(),
+])
@@ -1,44 +1,60 @@
+import os
 from tokens import TokenKind, Token
 from expr import *
 from stmt import *
 from function import *
 
+# NOTE: shorter bodies are parsed at once, they are cheap and may be inlined
+LAZY_MIN_TOKENS = 64
+
 class ParseError(Exception):
     pass
 
 class Parser:
-    def __init__(self, tokens, eh):
+    def __init__(self, tokens, eh, lazy=None):
         self.tokens = tokens
         self.eh = eh
         self.current = 0
         self.loop_depth = 0
+        # NOTE: passes of LazyBody, None means that all bodies are parsed at once
+        self.lazy = lazy
 
     def parse(self):
         try:
             stmts = []
             while not self.is_at_end():
-                s = self.declaration()
+                s = self.declaration(True)
                 if s is not None:
                     stmts.append(s)
             return stmts
         except ParseError:
             return None
     
-    def declaration(self):
+    def declaration(self, top_level=False):
         try:
             if self.match(TokenKind.CLASS):
-                return self.class_declaration()
+                return self.class_declaration(top_level)
             if self.check(TokenKind.FUN) and self.check_next(TokenKind.IDENTIFIER):
                 self.consume(TokenKind.FUN, '')
-                return self.function('function');
+                return self.function('function', top_level);
+            # NOTE: `async fun name` is told from `async fun (...)` expression by the third token
+            if self.check(TokenKind.ASYNC) and self.check_next(TokenKind.FUN) and \
+               self.current + 2 < len(self.tokens) and self.tokens[self.current + 2].kind == TokenKind.IDENTIFIER:
+                self.consume(TokenKind.ASYNC, '')
+                self.consume(TokenKind.FUN, '')
+                stmt = self.function('function')
+                stmt.function.is_async = True
+                return stmt
             if self.match(TokenKind.VAR):
                 return self.var_declaration()
+            if self.match(TokenKind.IMPORT):
+                return self.import_declaration()
             return self.statement()
         except ParseError:
             self.synchronize()
         return None
     
-    def class_declaration(self):
+    def class_declaration(self, top_level=False):
         name = self.consume(TokenKind.IDENTIFIER, 'Expect class name')
         super_class = None
         if self.match(TokenKind.LESS):
@@ -47,15 +63,20 @@ class Parser:
         self.consume(TokenKind.LEFT_BRACE, 'Expect "{" before class body')
         methods = []
         while not self.check(TokenKind.RIGHT_BRACE) and not self.is_at_end():
-            methods.append(self.function("method"))
+            is_async = self.match(TokenKind.ASYNC)
+            method = self.function("method", top_level and not is_async, name, super_class is not None)
+            method.function.is_async = is_async
+            methods.append(method)
         self.consume(TokenKind.RIGHT_BRACE, 'Expect "}" after class body')
         return ClassStmt(name, super_class, methods)
     
-    def function(self, kind):
+    def function(self, kind, lazy=False, class_name=None, has_super=False):
         name = self.consume(TokenKind.IDENTIFIER, f'Expect {kind} name')
+        if lazy and self.lazy is not None:
+            return FunctionStmt(name, self.function_body(kind, LazyBody(None, name, class_name, has_super, self.lazy)))
         return FunctionStmt(name, self.function_body(kind))
 
-    def function_body(self, kind):
+    def function_body(self, kind, lazy=None):
         self.consume(TokenKind.LEFT_PAREN, f'Expect "(" after {kind} name')
         params = []
         if not self.check(TokenKind.RIGHT_PAREN):
@@ -67,9 +88,52 @@ class Parser:
                     break
         self.consume(TokenKind.RIGHT_PAREN, 'Expect ")" after parameters')
         self.consume(TokenKind.LEFT_BRACE, 'Expect "{" before ' + kind + ' body')
+        if lazy is not None:
+            end = self.body_end()
+            if end - self.current >= LAZY_MIN_TOKENS:
+                # Pre-parsing: only the tokens of the body are kept
+                lazy.tokens = self.tokens[self.current:end]
+                self.current = end + 1
+                function = FunctionExpr(params, [])
+                function.lazy = lazy
+                return function
         body = self.block()
         return FunctionExpr(params, body)
+
+    def body_end(self):
+        # Index of `}` closing the body, current when the body has to be parsed at once:
+        # it has `yield` or `await` (the function may be a generator or async) or `}` is missing
+        depth = 1
+        i = self.current
+        while self.tokens[i].kind != TokenKind.EOF:
+            kind = self.tokens[i].kind
+            if kind == TokenKind.YIELD or kind == TokenKind.AWAIT:
+                return self.current
+            if kind == TokenKind.LEFT_BRACE:
+                depth += 1
+            elif kind == TokenKind.RIGHT_BRACE:
+                depth -= 1
+                if depth == 0:
+                    return i
+            i += 1
+        return self.current
     
+    def import_declaration(self):
+        # import "path/name.lang"; or import "path" as name;
+        keyword = self.previous()
+        path = self.consume(TokenKind.STRING, 'Expect module path after "import"')
+        if self.check(TokenKind.IDENTIFIER) and self.peek().lexeme == 'as':
+            self.advance()
+            name = self.consume(TokenKind.IDENTIFIER, 'Expect module name after "as"')
+        else:
+            # NOTE: module is named by its file, e.g. "lib/math.lang" is `math`
+            stem = os.path.splitext(os.path.basename(path.literal))[0]
+            if not stem.isidentifier():
+                raise self.error(path, 'Expect "as" and module name, file name is not a name')
+            name = Token(TokenKind.IDENTIFIER, stem, None, path.line)
+        self.consume(TokenKind.SEMICOLON, 'Expect ";" after import')
+        return ImportStmt(keyword, path.literal, name)
+
     def var_declaration(self):
         name = self.consume(TokenKind.IDENTIFIER, 'Expect variable name')
         initializer = None
@@ -87,6 +151,8 @@ class Parser:
             return self.print_statement()
         if self.match(TokenKind.RETURN):
             return self.return_statement()
+        if self.match(TokenKind.YIELD):
+            return self.yield_statement()
         if self.match(TokenKind.WHILE):
             return self.while_statement()
         if self.match(TokenKind.LEFT_BRACE):
@@ -99,6 +165,10 @@ class Parser:
         # For loop is syntactic sugar of while loop,
         # so, for loop is desugar into while loop
         self.consume(TokenKind.LEFT_PAREN, 'Expect "(" after "for"')
+        # NOTE: `for (var x in ...` is told from `for (var x = ...` by the third token
+        if self.check(TokenKind.VAR) and self.current + 2 < len(self.tokens) and \
+           self.tokens[self.current + 2].kind == TokenKind.IN:
+            return self.for_in_statement()
         initializer = None
         if self.match(TokenKind.SEMICOLON):
             # initializer = None
@@ -129,6 +199,19 @@ class Parser:
         finally:
             self.loop_depth -= 1
     
+    def for_in_statement(self):
+        self.consume(TokenKind.VAR, 'Expect "var" in for-in loop')
+        name = self.consume(TokenKind.IDENTIFIER, 'Expect variable name')
+        self.consume(TokenKind.IN, 'Expect "in" after variable name')
+        iterable = self.expression()
+        self.consume(TokenKind.RIGHT_PAREN, 'Expect ")" after for-in clauses')
+        try:
+            self.loop_depth += 1
+            body = self.statement()
+            return ForInStmt(name, iterable, body)
+        finally:
+            self.loop_depth -= 1
+
     def if_statement(self):
         self.consume(TokenKind.LEFT_PAREN, 'Expect "(" after "if"')
         condition = self.expression()
@@ -152,6 +235,14 @@ class Parser:
         self.consume(TokenKind.SEMICOLON, 'Expect ";" after return value')
         return ReturnStmt(keyword, value)
     
+    def yield_statement(self):
+        keyword = self.previous()
+        value = None
+        if not self.check(TokenKind.SEMICOLON):
+            value = self.expression()
+        self.consume(TokenKind.SEMICOLON, 'Expect ";" after yield value')
+        return YieldStmt(keyword, value)
+
     def while_statement(self):
         self.consume(TokenKind.LEFT_PAREN, 'Expect "(" after "while"')
         expr = self.expression()
@@ -250,6 +341,9 @@ class Parser:
             operator = self.previous()
             right = self.unary()
             return UnaryExpr(operator, right)
+        if self.match(TokenKind.AWAIT):
+            keyword = self.previous()
+            return AwaitExpr(keyword, self.unary())
         return self.call()
     
     def call(self):
@@ -278,6 +372,11 @@ class Parser:
     def primary(self):
         if self.match(TokenKind.FUN):
             return self.function_body('function')
+        if self.match(TokenKind.ASYNC):
+            self.consume(TokenKind.FUN, 'Expect "fun" after "async"')
+            function = self.function_body('function')
+            function.is_async = True
+            return function
         if self.match(TokenKind.FALSE):
             return LiteralExpr(False)
         if self.match(TokenKind.TRUE):
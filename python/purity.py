@@ -0,0 +1,141 @@
+from common import Walker
+from function import LangFunction
+
+class Impure(Exception):
+    def __init__(self, message, token=None):
+        if token is not None:
+            message = f'{message} [line {token.line}]'
+        super().__init__(message)
+
+class PurityChecker(Walker):
+    # Checks that result of a function depends only on its arguments and
+    # calling it has no observable effect: it does not print, touch instances,
+    # create functions or classes, or assign non-local variables.
+    # Non-local variables may be read only if they hold pure functions,
+    # e.g. recursive `fib` reads itself. They are recorded in `reads`,
+    # so the caller can see when they are assigned later (see MemoizedFunction).
+    # NOTE: needs resolved distances, local variable has distance not greater
+    # than the number of scopes between it and the function body.
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.checked = {}
+        # NOTE: (environment, name, value) of every non-local read
+        self.reads = []
+        self.function = None
+        self.depth = 0
+
+    def is_pure(self, value):
+        return self.reason(value) is None
+
+    def reason(self, value):
+        # Returns why value is not a pure function, None when it is
+        if getattr(value, 'pure', False):
+            return None
+        if not isinstance(value, LangFunction):
+            return f'{self.interpreter.stringify(value)} is not a pure function'
+        if value.is_initializer:
+            return f'{value} is an initializer'
+        if value.declaration.is_async:
+            return f'{value} is async'
+        if value in self.checked:
+            # NOTE: recursive calls are assumed pure while the function is checked
+            return self.checked[value]
+        self.checked[value] = None
+        enclosing = (self.function, self.depth)
+        self.function, self.depth = value, 0
+        try:
+            if value.declaration.lazy is not None:
+                self.interpreter.compile_lazy(value.declaration)
+            self.walk(value.declaration.body)
+        except Impure as e:
+            self.checked[value] = f'{value} is not pure, {e}'
+        self.function, self.depth = enclosing
+        return self.checked[value]
+
+    def is_local(self, distance):
+        return distance is not None and distance <= self.depth
+
+    def read(self, name, distance):
+        if self.is_local(distance):
+            return
+        if distance is None:
+            # NOTE: globals of the function, e.g. of the module which declared it
+            env = self.function.globals
+            if env is None:
+                env = self.interpreter.main_globals
+        else:
+            # NOTE: closure is the environment enclosing the function body
+            env = self.function.closure.ancestor(distance - self.depth - 1)
+        value = env.get_value(name.lexeme)
+        self.reads.append((env, name.lexeme, value))
+        reason = self.reason(value)
+        if reason is not None:
+            raise Impure(f'it reads non-local `{name.lexeme}` ({reason})', name)
+
+    def assign(self, name, distance):
+        if not self.is_local(distance):
+            raise Impure(f'it assigns non-local `{name.lexeme}`', name)
+
+    # Statements
+    def visit_class_stmt(self, stmt):
+        raise Impure('it declares a class', stmt.name)
+
+    def visit_function_stmt(self, stmt):
+        raise Impure('it declares a function', stmt.name)
+
+    def visit_print_stmt(self, stmt):
+        raise Impure('it prints')
+
+    def visit_for_in_stmt(self, stmt):
+        self.walk_expr(stmt.iterable)
+        # NOTE: loop variable has its own scope
+        self.depth += 1
+        self.walk([stmt.body])
+        self.depth -= 1
+
+    def visit_yield_stmt(self, stmt):
+        raise Impure('it yields', stmt.keyword)
+
+    def visit_import_stmt(self, stmt):
+        raise Impure('it imports', stmt.keyword)
+
+    def visit_block_stmt(self, stmt):
+        if stmt.scoped:
+            self.depth += 1
+        self.walk(stmt.stmts)
+        if stmt.scoped:
+            self.depth -= 1
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        raise Impure('it uses `super`', expr.keyword)
+
+    def visit_this_expr(self, expr):
+        raise Impure('it uses `this`', expr.keyword)
+
+    def visit_get_expr(self, expr):
+        raise Impure('it reads a property', expr.name)
+
+    def visit_set_expr(self, expr):
+        raise Impure('it sets a property', expr.name)
+
+    def visit_function_expr(self, expr):
+        raise Impure('it creates a function')
+
+    def visit_await_expr(self, expr):
+        raise Impure('it awaits', expr.keyword)
+
+    def visit_variable_expr(self, expr):
+        self.read(expr.name, expr.depth)
+
+    def visit_assign_expr(self, expr):
+        self.assign(expr.name, expr.depth)
+        self.walk_expr(expr.value)
+
+    def visit_compare_locals_expr(self, expr):
+        for operand, distance in [(expr.left, expr.left_distance), (expr.right, expr.right_distance)]:
+            if hasattr(operand, 'name'):
+                self.read(operand.name, distance)
+
+    def visit_increment_expr(self, expr):
+        self.assign(expr.name, expr.distance)
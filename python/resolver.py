@@ -1,4 +1,6 @@
 from common import Visitor
+from expr import *
+from stmt import *
 from enum import Enum
 
 class FunctionType(Enum):
@@ -19,20 +21,41 @@ class VariableState(Enum):
     CLASS_NAME = 4
 
 class Variable:
-    def __init__(self, name, state):
+    def __init__(self, name, state, function=None):
         self.name = name
         self.state = state
+        # NOTE: FunctionExpr in which variable is declared, None for top-level blocks
+        self.function = function
+        self.captured = False
+
+class FunctionScope:
+    def __init__(self, function, base, top):
+        self.function = function
+        # NOTE: index of function's own scope (parameters)
+        self.base = base
+        # NOTE: index of scope in which function is created, for methods it is
+        # the scope below "this", because "this" is added when method is bound
+        self.top = top
+        # NOTE: `return` statements with value, generator cannot have them
+        self.returns = []
 
 class Resolver(Visitor):
     # NOTE: If more static analysis is need, add them here
     # Example 1: add warning about unreachable code after return statement
-    def __init__(self, interpreter, eh):
-        self.interpreter = interpreter
+    def __init__(self, eh, warnings=True):
         self.eh = eh
+        self.warnings = warnings
         self.scopes = []
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
         self.inside_loop = False
+        # NOTE: maps declaration tokens and resolved expressions to their Variable,
+        # used by the passes running after the resolver (e.g. TypeInferrer)
+        self.bindings = {}
+        self.function_exprs = []
+        self.function_scopes = []
+        # NOTE: the only AwaitExpr allowed in the statement being resolved
+        self.await_position = None
 
     def resolve(self, stmts):
         for stmt in stmts:
@@ -48,7 +71,7 @@ class Resolver(Visitor):
     def end_scope(self):
         scope = self.scopes.pop()
         for entry in scope.values():
-            if entry.state == VariableState.DEFINED:
+            if entry.state == VariableState.DEFINED and self.warnings:
                 # self.eh.errorT(entry.name, 'Local variable is not used')
                 self.eh.warningT(entry.name, 'local variable is not used')
     
@@ -71,6 +94,8 @@ class Resolver(Visitor):
             declaration = FunctionType.METHOD
             if method.name.lexeme == 'init':
                 declaration = FunctionType.INITIALIZER
+                if method.function.is_async:
+                    self.eh.errorT(method.name, 'An initializer cannot be async')
             self.resolve_function(method, declaration)
         self.end_scope()
         if stmt.super_class is not None:
@@ -88,35 +113,87 @@ class Resolver(Visitor):
         if stmt.else_branch is not None:
             self._resolve(stmt.else_branch)
 
+    def visit_import_stmt(self, stmt):
+        self.declare(stmt.name)
+        self.define(stmt.name)
+
     def visit_var_stmt(self, stmt):
         self.declare(stmt.name)
         if stmt.initializer is not None:
+            self.resolve_awaited(stmt, stmt.initializer)
             self._resolve(stmt.initializer)
         self.define(stmt.name)
 
     def visit_expression_stmt(self, stmt):
+        self.resolve_awaited(stmt, stmt.expr)
         self._resolve(stmt.expr)
 
     def visit_print_stmt(self, stmt):
+        self.resolve_awaited(stmt, stmt.expr)
         self._resolve(stmt.expr)
 
     def visit_return_stmt(self, stmt):
         if self.current_function is FunctionType.NONE:
-            self.eh.error(stmt.keyword, 'Cannot return from top-level code')
+            self.eh.errorT(stmt.keyword, 'Cannot return from top-level code')
         if stmt.value is not None:
             if self.current_function is FunctionType.INITIALIZER:
-                self.eh.error(stmt.keyword, 'Cannot return a value from an initializer')
+                self.eh.errorT(stmt.keyword, 'Cannot return a value from an initializer')
+            if len(self.function_scopes) > 0:
+                self.function_scopes[-1].returns.append(stmt)
+            self.resolve_awaited(stmt, stmt.value)
             self._resolve(stmt.value)
 
+    def visit_yield_stmt(self, stmt):
+        if self.current_function is FunctionType.NONE:
+            self.eh.errorT(stmt.keyword, 'Cannot yield from top-level code')
+        elif self.current_function is FunctionType.INITIALIZER:
+            self.eh.errorT(stmt.keyword, 'Cannot yield from an initializer')
+        elif self.current_function_expr().is_async:
+            self.eh.errorT(stmt.keyword, 'Cannot yield from an async function')
+        else:
+            self.current_function_expr().is_generator = True
+        if stmt.value is not None:
+            self._resolve(stmt.value)
+
+    def resolve_awaited(self, stmt, expr):
+        # `await` can be only the whole value of a statement: `await e;`, `x = await e;`,
+        # `o.x = await e;`, `var x = await e;`, `print await e;` and `return await e;`,
+        # such statement is run by GeneratorExecutor
+        if isinstance(expr, (AssignExpr, SetExpr)):
+            expr = expr.value
+        stmt.awaited = expr if isinstance(expr, AwaitExpr) else None
+        if stmt.awaited is not None:
+            stmt.yields = True
+        self.await_position = stmt.awaited
+
     def visit_while_stmt(self, stmt):
         self.inside_loop = True
         self._resolve(stmt.condition)
         self._resolve(stmt.body)
         self.inside_loop = False
 
+    def visit_for_in_stmt(self, stmt):
+        self._resolve(stmt.iterable)
+        enclosing_loop = self.inside_loop
+        self.inside_loop = True
+        # NOTE: loop variable has its own scope, like `var` in a for loop initializer
+        self.begin_scope()
+        self.declare(stmt.name)
+        self.define(stmt.name)
+        self._resolve(stmt.body)
+        self.end_scope()
+        self.inside_loop = enclosing_loop
+
     def visit_block_stmt(self, stmt):
+        stmt.scoped = any([isinstance(s, (VarStmt, ClassStmt, FunctionStmt, ImportStmt)) for s in stmt.stmts])
+        if not stmt.scoped:
+            # NOTE: block which declares nothing does not get its own environment,
+            # e.g. body and increment of desugared for loop
+            self.resolve(stmt.stmts)
+            return
         self.begin_scope()
         self.resolve(stmt.stmts)
+        stmt.captured = any([v.captured for v in self.scopes[-1].values()])
         self.end_scope()
 
     def visit_break_stmt(self, stmt):
@@ -129,26 +206,101 @@ class Resolver(Visitor):
             if name.lexeme in self.scopes[-1]:
                 self.eh.errorT(name, 'Already variable with this name in this scope')
             # Add variable to innermost scope
-            self.scopes[-1][name.lexeme] = Variable(name, VariableState.DECLARED)
+            variable = Variable(name, VariableState.DECLARED, self.current_function_expr())
+            self.scopes[-1][name.lexeme] = variable
+            self.bindings[name] = variable
     
     def define(self, name):
         if len(self.scopes) > 0:
-            self.scopes[-1][name.lexeme] = Variable(name, VariableState.DEFINED)
+            self.scopes[-1][name.lexeme].state = VariableState.DEFINED
+
+    def current_function_expr(self):
+        if len(self.function_exprs) == 0:
+            return None
+        return self.function_exprs[-1]
     
     def resolve_function(self, function, type):
         enclosing_function = self.current_function
         self.current_function = type
-        self.visit_function_expr(function.function)
+        is_method = type in [FunctionType.METHOD, FunctionType.INITIALIZER]
+        self.resolve_function_body(function.function, is_method)
         self.current_function = enclosing_function
 
-    # Expressions
-    def visit_function_expr(self, expr):
+    def resolve_function_body(self, function, is_method):
+        if function.lazy is not None:
+            # NOTE: body is resolved when it is parsed, see resolve_lazy,
+            # captures stay None, so the function keeps its whole environment
+            return
+        base = len(self.scopes)
+        top = base - 2 if is_method else base - 1
+        function.captures = set()
+        self.function_scopes.append(FunctionScope(function, base, top))
+        self.function_exprs.append(function)
         self.begin_scope()
-        for param in expr.params:
+        for param in function.params:
             self.declare(param)
             self.define(param)
-        self.resolve(expr.body)
+        self.resolve(function.body)
         self.end_scope()
+        self.function_exprs.pop()
+        function_scope = self.function_scopes.pop()
+        if function.is_generator:
+            for stmt in function_scope.returns:
+                self.eh.errorT(stmt.keyword, 'Cannot return a value from a generator')
+        if function.is_generator or function.is_async:
+            for stmt in function.body:
+                self.mark_yields(stmt)
+
+    def resolve_lazy(self, function, lazy):
+        # Body of a lazy function (see LazyBody), the only scopes
+        # around it are `super` and `this` of the class of a method
+        if lazy.class_name is None:
+            self.current_function = FunctionType.FUNCTION
+            self.resolve_function_body(function, False)
+            return
+        self.current_class = ClassType.CLASS
+        if lazy.has_super:
+            self.current_class = ClassType.SUBCLASS
+            self.begin_scope()
+            self.scopes[-1]['super'] = Variable('super', VariableState.DECLARED)
+        self.begin_scope()
+        self.scopes[-1]['this'] = Variable(lazy.class_name, VariableState.CLASS_NAME)
+        self.current_function = FunctionType.METHOD
+        if lazy.name.lexeme == 'init':
+            self.current_function = FunctionType.INITIALIZER
+        self.resolve_function_body(function, True)
+
+    def mark_yields(self, stmt):
+        # Marks statements which contain `yield` or `await` (not in nested functions),
+        # only these are executed by GeneratorExecutor
+        if isinstance(stmt, YieldStmt):
+            stmt.yields = True
+        elif isinstance(stmt, BlockStmt):
+            stmt.yields = any([self.mark_yields(s) for s in stmt.stmts])
+        elif isinstance(stmt, IfStmt):
+            stmt.yields = any([self.mark_yields(s) for s in [stmt.then_branch, stmt.else_branch]])
+        elif isinstance(stmt, (WhileStmt, ForInStmt)):
+            stmt.yields = self.mark_yields(stmt.body)
+        elif stmt is None:
+            return False
+        return stmt.yields
+
+    def capture(self, scope_index):
+        # Every function between the reference and the scope of the variable
+        # has to keep that scope in its closure
+        for function_scope in reversed(self.function_scopes):
+            if function_scope.base <= scope_index:
+                return
+            level = function_scope.top - scope_index
+            if level >= 0:
+                function_scope.function.captures.add(level)
+
+    # Expressions
+    def visit_function_expr(self, expr):
+        enclosing_function = self.current_function
+        self.current_function = FunctionType.FUNCTION
+        self.resolve_function_body(expr, False)
+        self.current_function = enclosing_function
     
     def visit_super_expr(self, expr):
         if self.current_class == ClassType.NONE:
@@ -202,12 +354,28 @@ class Resolver(Visitor):
     def visit_unary_expr(self, expr):
         self._resolve(expr.right)
 
+    def visit_await_expr(self, expr):
+        function = self.current_function_expr()
+        if function is None or not function.is_async:
+            self.eh.errorT(expr.keyword, 'Cannot await outside of an async function')
+        elif expr is not self.await_position:
+            self.eh.errorT(expr.keyword, 'Await has to be the whole value of a statement')
+        self.await_position = None
+        self._resolve(expr.value)
+
     def resolve_local(self, expr, name, is_read):
         i = len(self.scopes) - 1
         while i >= 0:
-            if self.scopes[i].get(name.lexeme) is not None:
-                self.interpreter.resolve(expr, len(self.scopes)-1-i)
+            variable = self.scopes[i].get(name.lexeme)
+            if variable is not None:
+                expr.depth = len(self.scopes)-1-i
+                self.bindings[expr] = variable
+                if variable.function is not self.current_function_expr():
+                    variable.captured = True
+                    self.capture(i)
                 if is_read: 
-                    self.scopes[i].get(name.lexeme).state = VariableState.READ
+                    variable.state = VariableState.READ
                 return
             i = i - 1
+        # NOTE: global, also when the expression was resolved before (see Inliner)
+        expr.depth = None
@@ -0,0 +1,80 @@
+#!/bin/bash
+
+# Compares output of examples (and of the scenarios in ../tests) with the expected
+# output in ../tests/expected. Optimizations must not change what a program prints,
+# so every example is run with every optimization pass on and off.
+# Usage: ./run_tests.sh (from this directory), exits with 1 when a check fails
+
+expected_dir=../tests/expected
+failed=0
+
+FLAGS=(
+  ""
+  "INFERTYPES=0"
+  "FUSE=0"
+  "INLINE=0"
+  "LOOPOPT=0"
+  "INFERTYPES=0 FUSE=0 INLINE=0 LOOPOPT=0"
+  "LAZYPARSE=1"
+)
+
+check() {
+  # check <name> <output> [label]: compares output with $expected_dir/<name>.out
+  local label=${3:-$1}
+  if [ "$2" == "$(cat $expected_dir/$1.out)" ]
+  then
+    echo -e "$label \033[32mPASSED...\033[0m"
+  else
+    echo -e "$label \033[31mFAILED...\033[0m"
+    diff <(echo "$2") $expected_dir/$1.out | head -n 10
+    failed=1
+  fi
+}
+
+for entry in ../examples/*.lang ../tests/*.lang
+do
+  name=$(basename "$entry" .lang)
+  # NOTE: examples without expected output (e.g. printing time) are only run by run_examples_test.sh
+  [ -f $expected_dir/$name.out ] || continue
+  for flags in "${FLAGS[@]}"
+  do
+    check $name "$(env $flags timeout 60 python3 lang.py "$entry" 2>&1)" "$name${flags:+ [$flags]}"
+  done
+done
+
+# Program API: one program run by many threads
+check lazy_threads "$(python3 ../tests/lazy_threads.py 2>&1)"
+
+# Program API: a module imported by many runs is compiled once
+check module_cache "$(python3 ../tests/module_cache.py 2>&1)"
+
+# --batch: every script runs in its own interpreter, also when one worker runs both,
+# output before the summary (which has timings) is compared
+check batch "$(WORKERS=1 python3 lang.py --batch ../tests/import_counter.lang ../tests/import_counter.lang 2>&1 | sed '/==> summary <==/q')"
+
+# LANGCACHE: modules compiled by the first run are loaded from the cache by the second
+cache=$(mktemp -d /tmp/lang_test_cache_XXXXXX)
+check modules "$(LANGCACHE=$cache python3 lang.py ../examples/modules.lang 2>&1)" "modules [LANGCACHE compile]"
+check modules "$(LANGCACHE=$cache python3 lang.py ../examples/modules.lang 2>&1)" "modules [LANGCACHE cached]"
+[ -n "$(ls $cache)" ] || { echo -e "LANGCACHE \033[31mFAILED...\033[0m nothing cached"; failed=1; }
+rm -rf $cache
+
+# --snapshot: a script runs over the saved globals of a prelude
+snapshot=$(mktemp -u /tmp/lang_test_XXXXXX.snap)
+python3 lang.py --save-snapshot $snapshot ../tests/snapshot/prelude.lang
+check snapshot "$(python3 lang.py --snapshot $snapshot ../tests/snapshot/use.lang 2>&1)"
+rm -f $snapshot
+
+# --serve: scripts sent by client.py print what they print when run directly
+socket=$(mktemp -u /tmp/lang_test_XXXXXX.sock)
+python3 lang.py --serve $socket > /dev/null &
+server=$!
+for i in $(seq 50); do [ -S $socket ] && break; sleep 0.1; done
+check modules "$(python3 client.py $socket ../examples/modules.lang 2>&1)" "modules [--serve]"
+check import_scope "$(cd ../examples && python3 ../python/client.py $socket - < import_scope.lang 2>&1)" "import_scope [--serve stdin]"
+# NOTE: background jobs of a script ignore SIGINT, so the server is terminated
+kill $server
+wait $server 2> /dev/null
+rm -f $socket
+
+exit $failed
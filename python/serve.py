@@ -0,0 +1,209 @@
+import io
+import os
+import sys
+import stat
+import json
+import signal
+import socket
+import hashlib
+import traceback
+from client import send_frame, OUTPUT, EXIT
+from natives import cleanup
+from modules import preload
+
+# NOTE: number of requests run at the same time, next requests wait in the socket backlog
+SERVE_JOBS = int(os.getenv('SERVEJOBS') or os.cpu_count() or 1)
+# NOTE: time limit of a request in seconds, 0 means no limit,
+# request can ask for a shorter one
+SERVE_TIMEOUT = float(os.getenv('SERVETIMEOUT') or 0)
+# NOTE: number of compiled programs kept by the server
+SERVE_CACHE = int(os.getenv('SERVECACHE') or 64)
+# NOTE: time for a client to send its request, the server reads requests one by one
+REQUEST_TIMEOUT = 5
+# NOTE: output is sent when this many characters are buffered, or when the script ends
+OUTPUT_BUFFER = 1 << 16
+
+class Timeout(BaseException):
+    # NOTE: BaseException, so it is not caught by the interpreter or by natives
+    pass
+
+def on_timeout(signum, frame):
+    raise Timeout()
+
+class SocketOutput(io.TextIOBase):
+    # stdout of a request, sent to the client in OUTPUT frames
+    def __init__(self, conn):
+        self.conn = conn
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_BUFFER:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.size == 0:
+            return
+        data = ''.join(self.parts).encode('utf-8', 'replace')
+        self.parts, self.size = [], 0
+        send_frame(self.conn, OUTPUT, len(data), data)
+
+def read_request(conn):
+    # (source, cwd, directory, timeout) of the request, or error message,
+    # imports of the script are relative to directory
+    conn.settimeout(REQUEST_TIMEOUT)
+    line = conn.makefile('rb').readline()
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None, 'ERROR: invalid request'
+    cwd = message.get('cwd')
+    directory = message.get('directory') or cwd
+    timeout = float(message.get('timeout') or 0)
+    if SERVE_TIMEOUT > 0 and (timeout <= 0 or timeout > SERVE_TIMEOUT):
+        timeout = SERVE_TIMEOUT
+    if 'source' in message:
+        return (message['source'], cwd, directory, timeout), None
+    path = os.path.join(cwd or '', message.get('path') or '')
+    if 'directory' not in message:
+        directory = os.path.dirname(os.path.abspath(path))
+    try:
+        with open(path, 'r') as f:
+            return (f.read(), cwd, directory, timeout), None
+    except OSError:
+        return None, f'ERROR: cannot open {path}'
+
+def compiled(lang_class, cache, source, directory):
+    # (program, output of compilation) for source, from the cache when possible,
+    # program is None when there are errors
+    # NOTE: the same source in another directory imports other modules
+    key = hashlib.sha256(f'{directory}\n{source}'.encode('utf-8')).digest()
+    if key in cache:
+        # NOTE: dict keeps order, used entry is moved to the end, the first one is the oldest
+        entry = cache.pop(key)
+    else:
+        output = io.StringIO()
+        program = lang_class(output).compile(source)
+        entry = (program, output.getvalue())
+    if entry[0] is not None:
+        # NOTE: modules compiled by the server are inherited by the forked requests
+        preload(lang_class, entry[0], directory)
+        if len(cache) >= SERVE_CACHE:
+            del cache[next(iter(cache))]
+    cache[key] = entry
+    return entry
+
+def run_request(conn, entry, cwd, directory, timeout):
+    # Runs in the forked process, returns exit status of the script
+    program, output = entry
+    stdout = SocketOutput(conn)
+    sys.stdout = stdout
+    status = 0 if program is not None else 69
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        if timeout > 0:
+            signal.signal(signal.SIGALRM, on_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        print(output, end='')
+        if program is not None and program.run(stdout=stdout, directory=directory).had_runtime_error:
+            status = 70
+    except Timeout:
+        print(f'ERROR: timed out after {timeout:g} s')
+        status = 124
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc(file=stdout)
+        status = 1
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        cleanup()
+    stdout.flush()
+    return status
+
+def answer(conn, output, status):
+    data = output.encode('utf-8')
+    send_frame(conn, OUTPUT, len(data), data)
+    send_frame(conn, EXIT, status)
+
+def handle(lang_class, server, conn, cache):
+    # Returns pid of the process running the request, None when it was answered by the server
+    request, error = read_request(conn)
+    if error is not None:
+        answer(conn, error + '\n', 68)
+        return None
+    source, cwd, directory, timeout = request
+    try:
+        entry = compiled(lang_class, cache, source, directory)
+    except Exception:
+        # NOTE: bug of the compiler is reported to the client, the server keeps running
+        answer(conn, traceback.format_exc(), 1)
+        return None
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    # NOTE: forked process never returns to the server loop
+    status = 1
+    try:
+        server.close()
+        conn.settimeout(None)
+        status = run_request(conn, entry, cwd, directory, timeout)
+        send_frame(conn, EXIT, status)
+    except BaseException:
+        # NOTE: e.g. the client went away
+        pass
+    finally:
+        os._exit(status)
+
+def reap(children, block):
+    # Forgets finished requests, with block waits for at least one
+    while len(children) > 0:
+        pid, _ = os.waitpid(-1, 0 if block else os.WNOHANG)
+        if pid == 0:
+            return
+        children.discard(pid)
+        if block:
+            return
+
+def serve(lang_class, path):
+    # Runs scripts sent by clients (see client.py), every request runs in a process forked
+    # from the server, so it starts with everything imported and cannot change the server
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            print(f'ERROR: {path} exists and is not a socket')
+            return 69
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(max(SERVE_JOBS * 4, 16))
+    print(f'serving on {path}, {SERVE_JOBS} jobs', flush=True)
+    cache = {}
+    children = set()
+    try:
+        while True:
+            reap(children, False)
+            while len(children) >= SERVE_JOBS:
+                reap(children, True)
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    pid = handle(lang_class, server, conn, cache)
+                except OSError:
+                    # NOTE: e.g. the client went away before sending the request
+                    continue
+                if pid is not None:
+                    children.add(pid)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(path)
+    return 0
@@ -0,0 +1,151 @@
+import os
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+from common import NativeError
+from natives import NativeFunction, NativeObject, module, check_number, check_integer, check_index, CLEANUPS
+from lists import List, FloatArray, check_range
+
+# Shared arrays created by this process, released by release_shared when the program ends
+OWNED = set()
+
+def attach(name, length):
+    # Shared array sent by other process, e.g. returned by parallelMap worker
+    for shared in OWNED:
+        if shared.memory.name == name and shared.owner == os.getpid():
+            return shared
+    # NOTE: array created by a worker is owned by the process which gets it,
+    # the worker ends with its parallelMap call
+    # NOTE: attaching registers the memory with the resource tracker of this process,
+    # the sender dropped its registration (see SharedArray.__reduce__)
+    shared = SharedArray(shared_memory.SharedMemory(name), length, os.getpid())
+    OWNED.add(shared)
+    return shared
+
+class SharedArray(NativeObject):
+    # Array of numbers in shared memory, forked parallelMap workers read and write it
+    # in place, without copying. The process which creates it owns it: release
+    # in the owner frees the memory, in other processes it only detaches the array.
+    def __init__(self, memory, length, owner):
+        super().__init__()
+        self.memory = memory
+        self.values = memory.buf[:8 * length].cast('d')
+        self.length = length
+        self.owner = owner
+
+    def __str__(self):
+        return f'<shared array {self.length}>'
+
+    def __reduce__(self):
+        # NOTE: only the name is pickled, the values stay where they are
+        self.check('send')
+        if self.owner == os.getpid():
+            # NOTE: sent by its creator, e.g. returned by parallelMap worker, the receiving
+            # process becomes the owner. Otherwise the resource tracker of the sender
+            # would report it as leaked and unlink it when the sender ends.
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+            self.owner = None
+            OWNED.discard(self)
+        return attach, (self.memory.name, self.length)
+
+    def check(self, name):
+        if self.values is None:
+            raise NativeError(f'{name}: shared array is released')
+
+    def iterate(self):
+        self.check('for-in')
+        return iter(self.values)
+
+    def get_item(self, interpreter, index):
+        self.check('get')
+        return self.values[check_index('get', index, self.length)]
+
+    def set_item(self, interpreter, index, value):
+        self.check('set')
+        check_number('set', value)
+        self.values[check_index('set', index, self.length)] = value
+        return value
+
+    def length_fn(self, interpreter):
+        return float(self.length)
+
+    def get_slice(self, interpreter, start, end):
+        # Copy of values from start to end as FloatArray
+        self.check('slice')
+        start, end = check_range('slice', start, end, self.length)
+        return FloatArray(array('d', self.values[start:end]))
+
+    def set_slice(self, interpreter, start, values):
+        # Copies numbers of List, FloatArray or SharedArray to the array from start
+        self.check('setSlice')
+        check_integer('setSlice', start)
+        if isinstance(values, List):
+            check_number('setSlice', *values.items)
+            values = array('d', values.items)
+        elif isinstance(values, SharedArray):
+            values.check('setSlice')
+            values = values.values
+        elif isinstance(values, FloatArray):
+            values = values.values
+        else:
+            raise NativeError('setSlice: values must be a list or an array')
+        if start < 0 or start + len(values) > self.length:
+            raise NativeError('setSlice: values do not fit in the array')
+        self.values[int(start):int(start) + len(values)] = values
+        return None
+
+    def sum(self, interpreter):
+        self.check('sum')
+        return float(sum(self.values))
+
+    def fill(self, interpreter, value):
+        self.check('fill')
+        check_number('fill', value)
+        self.values[:] = array('d', [value]) * self.length
+        return None
+
+    def release(self, interpreter):
+        # NOTE: releasing released array does nothing
+        if self.values is None:
+            return None
+        try:
+            self.values.release()
+        except BufferError:
+            raise NativeError('release: shared array is used, e.g. by a loop')
+        self.values = None
+        self.memory.close()
+        if self.owner == os.getpid():
+            self.memory.unlink()
+            OWNED.discard(self)
+        return None
+
+    methods = {
+        'get': (1, get_item),
+        'set': (2, set_item),
+        'length': (0, length_fn),
+        'slice': (2, get_slice),
+        'setSlice': (2, set_slice),
+        'sum': (0, sum),
+        'fill': (1, fill),
+        'release': (0, release),
+    }
+
+def new_shared_array(size):
+    check_integer('SharedArray', size)
+    if size < 1:
+        raise NativeError('SharedArray: size must be positive')
+    memory = shared_memory.SharedMemory(create=True, size=8 * int(size))
+    shared = SharedArray(memory, int(size), os.getpid())
+    OWNED.add(shared)
+    return shared
+
+def release_shared():
+    # NOTE: forked workers inherit OWNED, but they do not own the arrays
+    for shared in list(OWNED):
+        if shared.owner == os.getpid():
+            shared.release(None)
+
+CLEANUPS.append(release_shared)
+
+module('parallel', [
+    NativeFunction('SharedArray', 1, new_shared_array, False),
+])
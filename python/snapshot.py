@@ -0,0 +1,61 @@
+import pickle
+from common import GlobalEnvironment
+from interpreter import NATIVES
+from shared import SharedArray
+
+# NOTE: snapshot keeps AST nodes and runtime objects as they are, so a snapshot made
+# by a different version of the interpreter cannot be restored
+SNAPSHOT_VERSION = 1
+
+class SnapshotError(Exception):
+    pass
+
+class SnapshotPickler(pickle.Pickler):
+    # Natives are saved by name, they are restored as the natives of the loading process
+    def __init__(self, file):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.natives = {id(value): name for name, value in NATIVES.values.items()
+                        if not isinstance(value, (float, str, bool))}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, SharedArray):
+            # NOTE: shared memory is released when the program which saves it ends
+            raise pickle.PicklingError('shared arrays cannot be saved')
+        if obj is NATIVES:
+            return 'natives'
+        name = self.natives.get(id(obj))
+        if name is not None and NATIVES.values.get(name) is obj:
+            return ('native', name)
+        return None
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid == 'natives':
+            return NATIVES
+        kind, name = pid
+        if kind != 'native' or name not in NATIVES.values:
+            raise SnapshotError(f'unknown native {name}')
+        return NATIVES.values[name]
+
+def save_snapshot(globals, path):
+    # Saves globals (with everything they refer to: functions, classes, instances
+    # and the AST of their code) to the file
+    try:
+        with open(path, 'wb') as f:
+            SnapshotPickler(f).dump((SNAPSHOT_VERSION, globals))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        # NOTE: e.g. open file, generator or coroutine in globals
+        raise SnapshotError(f'globals cannot be saved: {e}')
+    except RecursionError:
+        raise SnapshotError('globals are nested too deeply')
+
+def load_snapshot(path):
+    # GlobalEnvironment saved by save_snapshot, used as the base of new globals
+    with open(path, 'rb') as f:
+        try:
+            version, globals = SnapshotUnpickler(f).load()
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+            raise SnapshotError('file is not a snapshot')
+    if version != SNAPSHOT_VERSION or not isinstance(globals, GlobalEnvironment):
+        raise SnapshotError('snapshot was made by a different version')
+    return globals
@@ -1,4 +1,10 @@
 class Stmt:
+    # NOTE: set by Resolver, True for statements of generator body containing `yield`
+    # and for statements of async function body containing `await`
+    yields = False
+    # NOTE: set by Resolver, AwaitExpr of statement which awaits (see GeneratorExecutor)
+    awaited = None
+
     def accept(self, visitor):
         pass
 
@@ -19,6 +25,16 @@ class FunctionStmt(Stmt):
     def accept(self, visitor):
         return visitor.visit_function_stmt(self)
 
+class ImportStmt(Stmt):
+    def __init__(self, keyword, path, name):
+        self.keyword = keyword
+        # NOTE: path as written, relative paths are resolved when the module is loaded
+        self.path = path
+        self.name = name
+
+    def accept(self, visitor):
+        return visitor.visit_import_stmt(self)
+
 class ReturnStmt(Stmt):
     def __init__(self, keyword, value):
         self.keyword = keyword
@@ -31,10 +47,24 @@ class WhileStmt(Stmt):
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
+        # NOTE: InvariantExpr nodes hoisted out of this loop by LoopOptimizer
+        self.invariants = []
 
     def accept(self, visitor):
         return visitor.visit_while_stmt(self)
 
+class ForInStmt(Stmt):
+    # `for (var name in iterable) body`, iterates over lists, maps, ranges, strings...
+    def __init__(self, name, iterable, body):
+        self.name = name
+        self.iterable = iterable
+        self.body = body
+        # NOTE: InvariantExpr nodes hoisted out of this loop by LoopOptimizer
+        self.invariants = []
+
+    def accept(self, visitor):
+        return visitor.visit_for_in_stmt(self)
+
 class IfStmt(Stmt):
     def __init__(self, condition, then_branch, else_branch):
         self.condition = condition
@@ -47,6 +77,10 @@ class IfStmt(Stmt):
 class BlockStmt(Stmt):
     def __init__(self, stmts):
         self.stmts = stmts
+        # NOTE: set by Resolver, `scoped` is False when block declares nothing,
+        # `captured` is False when none of its variables is used by a closure
+        self.scoped = True
+        self.captured = True
 
     def accept(self, visitor):
         return visitor.visit_block_stmt(self)
@@ -73,9 +107,29 @@ class PrintStmt(Stmt):
     def accept(self, visitor):
         return visitor.visit_print_stmt(self)
 
+class YieldStmt(Stmt):
+    def __init__(self, keyword, value):
+        self.keyword = keyword
+        self.value = value
+
+    def accept(self, visitor):
+        return visitor.visit_yield_stmt(self)
+
 class BreakStmt(Stmt):
     def __init__(self, name):
         self.name = name
 
     def accept(self, visitor):
         return visitor.visit_break_stmt(self)
+
+class CountedLoopStmt(Stmt):
+    # Fused `while (i < bound) { body; i = i + step; }`, produced by Fuser.
+    # Usually it is a desugared `for (var i = 0; i < n; i = i + 1)` loop.
+    def __init__(self, condition, body, increment, invariants):
+        self.condition = condition
+        self.body = body
+        self.increment = increment
+        self.invariants = invariants
+
+    def accept(self, visitor):
+        return visitor.visit_counted_loop_stmt(self)
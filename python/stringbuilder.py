@@ -0,0 +1,52 @@
+from common import format_number
+from natives import NativeFunction, NativeObject, module, check_number, lang_str
+
+class StringBuilder(NativeObject):
+    # Collects pieces of a string and joins them once in toString,
+    # so building a string of n pieces is O(n), `+` in a loop is O(n^2)
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.size = 0
+
+    def __str__(self):
+        return '<string builder>'
+
+    def append(self, interpreter, value):
+        value = lang_str(value)
+        self.parts.append(value)
+        self.size += len(value)
+        return None
+
+    def append_number(self, interpreter, value):
+        check_number('appendNumber', value)
+        value = format_number(value)
+        self.parts.append(value)
+        self.size += len(value)
+        return None
+
+    def length(self, interpreter):
+        return float(self.size)
+
+    def to_string(self, interpreter):
+        # NOTE: joined string replaces the parts, so calling toString again is cheap
+        if len(self.parts) != 1:
+            self.parts = [''.join(self.parts)]
+        return self.parts[0]
+
+    def clear(self, interpreter):
+        self.parts = []
+        self.size = 0
+        return None
+
+    methods = {
+        'append': (1, append),
+        'appendNumber': (1, append_number),
+        'length': (0, length),
+        'toString': (0, to_string),
+        'clear': (0, clear),
+    }
+
+module('string', [
+    NativeFunction('StringBuilder', 0, StringBuilder, False),
+])
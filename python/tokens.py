@@ -47,7 +47,12 @@ class TokenKind(Enum):
     TRUE = 35
     VAR = 36,
     WHILE = 37,
-    BREAK = 38
+    BREAK = 38,
+    IN = 40,
+    YIELD = 41,
+    ASYNC = 42,
+    AWAIT = 43,
+    IMPORT = 44
 
     EOF = 39
 
@@ -0,0 +1,244 @@
+from enum import Enum
+from common import Visitor
+from tokens import TokenKind
+from expr import VariableExpr, LiteralExpr
+
+class LangType(Enum):
+    NUMBER = 0
+    STRING = 1
+    BOOL = 2
+    NIL = 3
+    ANY = 4
+
+# NOTE: None is used as "no value seen yet", it is the bottom of the lattice
+def join(a, b):
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    return LangType.ANY
+
+NUMERIC_OPERATORS = [
+    TokenKind.GREATER, TokenKind.GREATER_EQUAL,
+    TokenKind.LESS, TokenKind.LESS_EQUAL,
+    TokenKind.MINUS, TokenKind.PLUS, TokenKind.STAR, TokenKind.SLASH
+]
+
+class TypeInferrer(Visitor):
+    # Infers which locals and parameters always hold a number (or a string),
+    # then marks BinaryExpr and UnaryExpr whose operands are proven numbers
+    # as `numeric`, so the interpreter can skip the operand checks.
+    # Globals are never inferred, they can be reassigned from anywhere (REPL too).
+    # Parameters are inferred only for local functions which are called directly,
+    # for every other function the callers are unknown.
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.types = {}
+        self.declared = {}
+        self.function_names = {}
+        self.local_functions = {}
+        self.escaping = set()
+        self.changed = False
+        self.annotate = False
+
+    def infer(self, stmts):
+        # Types only grow (see join), so this terminates
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            self.walk(stmts)
+        self.annotate = True
+        self.walk(stmts)
+
+    def report(self):
+        functions = {}
+        for variable in self.declared:
+            functions.setdefault(variable.function, []).append(variable)
+        for function, variables in functions.items():
+            name = self.function_names.get(function, '<script>')
+            types = ', '.join([f'{v.name.lexeme}: {self.type_name(self.types.get(v))}' for v in variables])
+            print(f'[TYPES] {name}: {types}')
+
+    def type_name(self, type):
+        if type is None:
+            return 'unknown'
+        return type.name.lower()
+
+    def walk(self, stmts):
+        for stmt in stmts:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def infer_expr(self, expr):
+        return expr.accept(self)
+
+    def assign(self, variable, type):
+        if variable is None:
+            return
+        self.declared[variable] = True
+        new_type = join(self.types.get(variable), type)
+        if new_type != self.types.get(variable):
+            self.types[variable] = new_type
+            self.changed = True
+
+    def type_of(self, expr):
+        variable = self.bindings.get(expr)
+        if variable is None:
+            return LangType.ANY
+        return self.types.get(variable)
+
+    def infer_function(self, function, name, direct):
+        self.function_names[function] = name
+        for param in function.params:
+            variable = self.bindings.get(param)
+            if direct:
+                self.declared[variable] = True
+            else:
+                self.assign(variable, LangType.ANY)
+        self.walk(function.body)
+
+    def visit_class_stmt(self, stmt):
+        self.assign(self.bindings.get(stmt.name), LangType.ANY)
+        if stmt.super_class is not None:
+            self.infer_expr(stmt.super_class)
+        for method in stmt.methods:
+            self.infer_function(method.function, f'{stmt.name.lexeme}.{method.name.lexeme} [line {method.name.line}]', False)
+
+    def visit_function_stmt(self, stmt):
+        variable = self.bindings.get(stmt.name)
+        self.assign(variable, LangType.ANY)
+        if variable is not None:
+            self.local_functions[variable] = stmt.function
+        direct = variable is not None and variable not in self.escaping
+        self.infer_function(stmt.function, f'fun {stmt.name.lexeme} [line {stmt.name.line}]', direct)
+
+    def visit_if_stmt(self, stmt):
+        self.infer_expr(stmt.condition)
+        self.walk([stmt.then_branch, stmt.else_branch])
+
+    def visit_var_stmt(self, stmt):
+        type = LangType.NIL
+        if stmt.initializer is not None:
+            type = self.infer_expr(stmt.initializer)
+        self.assign(self.bindings.get(stmt.name), type)
+
+    def visit_expression_stmt(self, stmt):
+        self.infer_expr(stmt.expr)
+
+    def visit_print_stmt(self, stmt):
+        self.infer_expr(stmt.expr)
+
+    def visit_return_stmt(self, stmt):
+        if stmt.value is not None:
+            self.infer_expr(stmt.value)
+
+    def visit_while_stmt(self, stmt):
+        self.infer_expr(stmt.condition)
+        self.walk([stmt.body])
+
+    def visit_for_in_stmt(self, stmt):
+        self.infer_expr(stmt.iterable)
+        self.assign(self.bindings.get(stmt.name), LangType.ANY)
+        self.walk([stmt.body])
+
+    def visit_import_stmt(self, stmt):
+        self.assign(self.bindings.get(stmt.name), LangType.ANY)
+
+    def visit_yield_stmt(self, stmt):
+        if stmt.value is not None:
+            self.infer_expr(stmt.value)
+
+    def visit_block_stmt(self, stmt):
+        self.walk(stmt.stmts)
+
+    def visit_break_stmt(self, stmt):
+        pass
+
+    # Expressions
+    def visit_super_expr(self, expr):
+        return LangType.ANY
+
+    def visit_this_expr(self, expr):
+        return LangType.ANY
+
+    def visit_get_expr(self, expr):
+        self.infer_expr(expr.object)
+        return LangType.ANY
+
+    def visit_set_expr(self, expr):
+        self.infer_expr(expr.object)
+        return self.infer_expr(expr.value)
+
+    def visit_function_expr(self, expr):
+        self.infer_function(expr, 'fun <lambda>', False)
+        return LangType.ANY
+
+    def visit_logical_expr(self, expr):
+        return join(self.infer_expr(expr.left), self.infer_expr(expr.right))
+
+    def visit_call_expr(self, expr):
+        arg_types = [self.infer_expr(arg) for arg in expr.arguments]
+        function = None
+        if isinstance(expr.callee, VariableExpr):
+            function = self.local_functions.get(self.bindings.get(expr.callee))
+        if function is None:
+            self.infer_expr(expr.callee)
+            return LangType.ANY
+        for param, type in zip(function.params, arg_types):
+            self.assign(self.bindings.get(param), type)
+        return LangType.ANY
+
+    def visit_variable_expr(self, expr):
+        variable = self.bindings.get(expr)
+        if variable in self.local_functions and variable not in self.escaping:
+            # Function is used as a value, its callers are unknown from now on
+            self.escaping.add(variable)
+            self.changed = True
+        return self.type_of(expr)
+
+    def visit_assign_expr(self, expr):
+        type = self.infer_expr(expr.value)
+        self.assign(self.bindings.get(expr), type)
+        return type
+
+    def visit_binary_expr(self, expr):
+        right = self.infer_expr(expr.right)
+        left = self.infer_expr(expr.left)
+        kind = expr.operator.kind
+        if self.annotate and left == LangType.NUMBER and right == LangType.NUMBER and kind in NUMERIC_OPERATORS:
+            # NOTE: division keeps its zero check, unless divisor is a non zero literal
+            if kind != TokenKind.SLASH or (isinstance(expr.right, LiteralExpr) and expr.right.value != 0):
+                expr.numeric = True
+        if kind in [TokenKind.MINUS, TokenKind.STAR, TokenKind.SLASH]:
+            return LangType.NUMBER
+        if kind == TokenKind.PLUS:
+            if left == LangType.NUMBER and right == LangType.NUMBER:
+                return LangType.NUMBER
+            if left == LangType.STRING or right == LangType.STRING:
+                return LangType.STRING
+            return LangType.ANY
+        return LangType.BOOL
+
+    def visit_grouping_expr(self, expr):
+        return self.infer_expr(expr.expression)
+
+    def visit_literal_expr(self, expr):
+        if expr.value is None:
+            return LangType.NIL
+        if isinstance(expr.value, bool):
+            return LangType.BOOL
+        if isinstance(expr.value, float):
+            return LangType.NUMBER
+        return LangType.STRING
+
+    def visit_await_expr(self, expr):
+        self.infer_expr(expr.value)
+        return LangType.ANY
+
+    def visit_unary_expr(self, expr):
+        right = self.infer_expr(expr.right)
+        if expr.operator.kind == TokenKind.BANG:
+            return LangType.BOOL
+        if self.annotate and right == LangType.NUMBER:
+            expr.numeric = True
+        return LangType.NUMBER
@@ -0,0 +1,58 @@
+# Runs one Program compiled with LAZYPARSE=1 by many threads at once, bodies of its
+# functions are compiled by the first call, every thread has to print the same output
+import io
+import os
+import sys
+import threading
+
+os.environ['LAZYPARSE'] = '1'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+from lang import Lang
+
+THREADS = 8
+
+source = '''
+fun collatz(n) {
+    var steps = 0;
+    while (n != 1) {
+        if (n - floor(n / 2) * 2 == 0) n = n / 2;
+        else n = 3 * n + 1;
+        steps = steps + 1;
+    }
+    return steps;
+}
+
+fun longest(limit) {
+    var best = 0;
+    var best_n = 0;
+    for (var n in range(1, limit, 1)) {
+        var steps = collatz(n);
+        if (steps > best) {
+            best = steps;
+            best_n = n;
+        }
+    }
+    return best_n;
+}
+
+print longest(n);
+print collatz(27);
+'''
+
+program = Lang().compile(source)
+outputs = [None] * THREADS
+
+def run(i):
+    stdout = io.StringIO()
+    lang = program.run(globals={'n': 300.0 + i}, stdout=stdout)
+    outputs[i] = (stdout.getvalue(), lang.had_runtime_error)
+
+threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+for output, had_runtime_error in outputs:
+    print(output, end='')
+    if had_runtime_error:
+        print('runtime error')
@@ -0,0 +1,41 @@
+# Runs one Program which imports a module twice, the module is compiled once per process
+# (see modules.COMPILED) but every run has its own module state
+import io
+import os
+import sys
+
+tests = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(tests, '..', 'python'))
+from lang import Lang
+import modules
+
+compiled = []
+compile_source = modules.compile_source
+
+def counting(compiler, source):
+    compiled.append(source)
+    return compile_source(compiler, source)
+
+modules.compile_source = counting
+
+program = Lang().compile('''
+import "modules/counter.lang";
+print counter.next();
+print counter.next();
+''')
+for i in range(2):
+    stdout = io.StringIO()
+    lang = program.run(stdout=stdout, directory=tests)
+    print(stdout.getvalue(), end='')
+    if lang.had_runtime_error:
+        print('runtime error')
+print(f'compiled {len(compiled)}')
+
+# NOTE: preload compiles imported modules without running them, e.g. before --serve forks
+modules.COMPILED.clear()
+modules.preload(Lang, program, tests)
+print(f'preloaded {os.path.relpath(next(iter(modules.COMPILED)), tests)}')
+stdout = io.StringIO()
+program.run(stdout=stdout, directory=tests)
+print(stdout.getvalue(), end='')
+print(f'compiled {len(compiled)}')